@@ -0,0 +1 @@
+# deprecated/__init__.py
@@ -1,12 +1,17 @@
 import math
+import functools
 from dataclasses import dataclass
 from typing import Union
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
 
-from pscan import pscan
+try:
+    from .pscan import pscan, pscan_chunked # imported as the deprecated package (src.models)
+except ImportError:
+    from pscan import pscan, pscan_chunked # run as a script from this directory (main.py)
 
 """
 
@@ -46,6 +51,10 @@ class MambaConfig:
     conv_bias: bool = True
 
     pscan: bool = True # use parallel scan mode or sequential mode when training
+    pscan_chunk: int = None # parallel scan over chunks of this many steps (a power of 2, checked) instead of padding L to a power of 2
+    scan_block: int = None # scan blocks of this many steps (any size), recomputed in backward, instead of materializing (B, L, ED, N)
+    compiled_scan: int = None # fused torch.compile'd CPU scan unrolling this many steps per call (e.g. 16), compiled on first use
+                              # when set, it is used instead of the scan chosen by pscan (at most one of pscan_chunk, scan_block and compiled_scan, checked)
 
     def __post_init__(self):
         self.d_inner = self.expand_factor * self.d_model # E*D = ED in comments
@@ -53,6 +62,18 @@ class MambaConfig:
         if self.dt_rank == 'auto':
             self.dt_rank = math.ceil(self.d_model / 16)
 
+        for name in ['pscan_chunk', 'scan_block', 'compiled_scan']:
+            value = getattr(self, name)
+            if value is not None and value < 1:
+                raise ValueError(f"{name} must be a positive number of steps, got {value}")
+        if self.pscan_chunk is not None and self.pscan_chunk & (self.pscan_chunk - 1):
+            raise ValueError(f"pscan_chunk must be a power of 2, got {self.pscan_chunk}")
+        scans = [name for name in ['pscan_chunk', 'scan_block', 'compiled_scan'] if getattr(self, name) is not None]
+        if len(scans) > 1:
+            raise ValueError(f"{' and '.join(scans)} select different scans, set at most one of them")
+        if not self.pscan and scans and scans[0] != 'compiled_scan':
+            raise ValueError(f"{scans[0]} configures the parallel scan, it cannot be combined with pscan=False")
+
 class Mamba(nn.Module):
     def __init__(self, config: MambaConfig):
         super().__init__()
@@ -84,6 +105,8 @@ class Mamba(nn.Module):
         for i, layer in enumerate(self.layers):
             x, caches[i] = layer.step(x, caches[i])
 
+        x = self.norm_f(x) # as in forward, so that stepping through a sequence gives forward's outputs
+
         return x, caches
 
 class ResidualBlock(nn.Module):
@@ -202,7 +225,9 @@ class MambaBlock(nn.Module):
         delta, B, C = torch.split(deltaBC, [self.config.dt_rank, self.config.d_state, self.config.d_state], dim=-1) # (B, L, dt_rank), (B, L, N), (B, L, N)
         delta = F.softplus(self.dt_proj(delta)) # (B, L, ED)
 
-        if self.config.pscan:
+        if self.config.compiled_scan is not None:
+            y = self.selective_scan_compiled(x, delta, A, B, C, D)
+        elif self.config.pscan:
             y = self.selective_scan(x, delta, A, B, C, D)
         else:
             y = self.selective_scan_seq(x, delta, A, B, C, D)
@@ -219,12 +244,18 @@ class MambaBlock(nn.Module):
 
         # y : (B, L, ED)
 
+        if self.config.scan_block is not None:
+            return self.selective_scan_blocks(x, delta, A, B, C, D)
+
         deltaA = torch.exp(delta.unsqueeze(-1) * A) # (B, L, ED, N)
         deltaB = delta.unsqueeze(-1) * B.unsqueeze(2) # (B, L, ED, N)
 
         BX = deltaB * (x.unsqueeze(-1)) # (B, L, ED, N)
         
-        hs = pscan(deltaA, BX)
+        if self.config.pscan_chunk is None:
+            hs = pscan(deltaA, BX)
+        else:
+            hs = pscan_chunked(deltaA, BX, self.config.pscan_chunk)
 
         y = (hs @ C.unsqueeze(-1)).squeeze(3) # (B, L, ED, N) @ (B, L, N, 1) -> (B, L, ED, 1)
 
@@ -232,6 +263,92 @@ class MambaBlock(nn.Module):
 
         return y
     
+    def selective_scan_blocks(self, x, delta, A, B, C, D):
+        # x : (B, L, ED)
+        # Δ : (B, L, ED)
+        # A : (ED, N)
+        # B : (B, L, N)
+        # C : (B, L, N)
+        # D : (ED)
+
+        # y : (B, L, ED)
+
+        # same result as selective_scan, but the (B, block, ED, N) tensors only ever exist for one block of time
+        # steps : each block is scanned from the state h left by the previous one and contracted with C right away.
+        # when training, the blocks are checkpointed : backward recomputes a block's intermediates instead of
+        # keeping them, so only the (B, ED, N) state at each block boundary is stored
+
+        _, L, _ = x.shape
+        block = self.config.scan_block
+
+        h = torch.zeros(x.size(0), self.config.d_inner, self.config.d_state, device=x.device, dtype=x.dtype) # (B, ED, N)
+        ys = []
+        for start in range(0, L, block):
+            args = (x[:, start:start+block], delta[:, start:start+block], A, B[:, start:start+block], C[:, start:start+block], h)
+            if torch.is_grad_enabled():
+                y, h = checkpoint(self._scan_block, *args, use_reentrant=False)
+            else:
+                y, h = self._scan_block(*args)
+            ys.append(y)
+
+        y = torch.cat(ys, dim=1) # (B, L, ED)
+
+        y = y + D * x
+
+        return y
+
+    @staticmethod
+    def _scan_block(x, delta, A, B, C, h):
+        # x : (B, T, ED), Δ : (B, T, ED), B : (B, T, N), C : (B, T, N), h : (B, ED, N) state before the block
+
+        # y : (B, T, ED) without the D * x term, h : (B, ED, N) state after the block
+
+        deltaA = torch.exp(delta.unsqueeze(-1) * A) # (B, T, ED, N)
+        deltaB = delta.unsqueeze(-1) * B.unsqueeze(2) # (B, T, ED, N)
+
+        BX = deltaB * (x.unsqueeze(-1)) # (B, T, ED, N)
+        BX = torch.cat([BX[:, :1] + deltaA[:, :1] * h.unsqueeze(1), BX[:, 1:]], dim=1) # h[0] = deltaA[0] * h + BX[0]
+
+        hs = pscan(deltaA, BX)
+
+        y = (hs @ C.unsqueeze(-1)).squeeze(3) # (B, T, ED, N) @ (B, T, N, 1) -> (B, T, ED, 1)
+
+        return y, hs[:, -1].clone() # a view would keep the whole block of states alive as the next block's input
+
+    def selective_scan_compiled(self, x, delta, A, B, C, D):
+        # x : (B, L, ED)
+        # Δ : (B, L, ED)
+        # A : (ED, N)
+        # B : (B, L, N)
+        # C : (B, L, N)
+        # D : (ED)
+
+        # y : (B, L, ED)
+
+        # same result as selective_scan, computed compiled_scan steps at a time by selective_scan_steps, which
+        # torch.compile turns into one fused loop (forward and backward) instead of pscan's many small ops
+
+        _, L, _ = x.shape
+        steps = self.config.compiled_scan
+        scan_steps = _compiled_scan_steps()
+
+        # every call sees the same number of steps (so it is compiled once) : the padding steps have Δ = 0,
+        # so deltaA = 1 and BX = 0 leave h unchanged, and their outputs are dropped
+        pad = -L % steps
+        xs, delta, B, C = (F.pad(t, (0, 0, 0, pad)) for t in (x, delta, B, C))
+
+        h = torch.zeros(x.size(0), self.config.d_inner, self.config.d_state, device=x.device, dtype=x.dtype) # (B, ED, N)
+        ys = []
+        for start in range(0, L + pad, steps):
+            y, h = scan_steps(xs[:, start:start+steps], delta[:, start:start+steps], A, B[:, start:start+steps], C[:, start:start+steps], h)
+            ys.append(y)
+
+        y = torch.cat(ys, dim=1)[:, :L] # (B, L, ED)
+
+        y = y + D * x
+
+        return y
+
     def selective_scan_seq(self, x, delta, A, B, C, D):
         # x : (B, L, ED)
         # Δ : (B, L, ED)
@@ -352,6 +469,26 @@ class MambaBlock(nn.Module):
         # todo : pq h.squeeze(1) ??
         return y, h.squeeze(1)
 
+def selective_scan_steps(x, delta, A, B, C, h):
+    # x : (B, T, ED), Δ : (B, T, ED), A : (ED, N), B : (B, T, N), C : (B, T, N), h : (B, ED, N) state before the steps
+
+    # y : (B, T, ED) without the D * x term, h : (B, ED, N) state after the steps
+
+    # written one step at a time for torch.compile to unroll : the steps fuse into one loop over (B, ED, N)
+    # and none of the (B, T, ED, N) tensors of selective_scan are materialized
+    ys = []
+    for t in range(x.size(1)):
+        delta_t = delta[:, t].unsqueeze(-1) # (B, ED, 1)
+        h = torch.exp(delta_t * A) * h + delta_t * B[:, t].unsqueeze(1) * x[:, t].unsqueeze(-1) # (B, ED, N)
+        ys.append((h * C[:, t].unsqueeze(1)).sum(-1)) # (B, ED)
+
+    return torch.stack(ys, dim=1), h
+
+@functools.lru_cache(maxsize=None)
+def _compiled_scan_steps():
+    # compiled lazily, importing the compiler stack only when a model asks for it
+    return torch.compile(selective_scan_steps)
+
 # taken straight from https://github.com/johnma2006/mamba-minimal/blob/master/model.py
 class RMSNorm(nn.Module):
     def __init__(self, d_model: int, eps: float = 1e-5):
@@ -223,4 +223,107 @@ class PScan(torch.autograd.Function):
 
         return Q.transpose(2, 1)[:, :L], grad_output.transpose(2, 1)[:, :L]
     
-pscan = PScan.apply
\ No newline at end of file
+pscan = PScan.apply
+
+
+class PScanChunked(torch.autograd.Function):
+    """
+    Same scan as PScan, but over fixed-size chunks of the sequence instead of the whole
+    sequence padded to the next power of two. Each chunk is scanned in parallel by
+    PScan.pscan, and the state at the end of a chunk is carried into the next one by
+    folding it into the chunk's first input: X[0] += A[0] * H[-1], hence H[0] = A[0] * H[-1] + X[0].
+    Only the last chunk is padded (at most chunk - 1 steps), and the in-place work
+    tensors are one chunk long, whatever L is.
+    """
+
+    @staticmethod
+    def forward(ctx, A_in, X_in, chunk):
+        """
+        Args:
+            A_in : (B, L, D, N)
+            X_in : (B, L, D, N)
+            chunk : int, power of two
+
+        Returns:
+            H : (B, L, D, N)
+        """
+
+        L = X_in.size(1)
+        chunk = min(chunk, npo2(L))
+
+        H = torch.empty_like(X_in)
+        h = None
+        for start in range(0, L, chunk):
+            end = min(start + chunk, L)
+
+            # cloning is requiered because of the in-place ops (padding clones too)
+            A = F.pad(A_in[:, start:end], (0, 0, 0, 0, 0, chunk - (end - start))) # (B, chunk, D, N)
+            X = F.pad(X_in[:, start:end], (0, 0, 0, 0, 0, chunk - (end - start))) # (B, chunk, D, N)
+            if h is not None:
+                X[:, 0].add_(A[:, 0] * h)
+
+            # parallel scan of the chunk (modifies X in-place)
+            PScan.pscan(A.transpose(2, 1), X.transpose(2, 1))
+
+            H[:, start:end] = X[:, :end - start]
+            h = H[:, end - 1]
+
+        ctx.chunk = chunk
+        ctx.save_for_backward(A_in, H)
+        return H
+
+    @staticmethod
+    def backward(ctx, grad_output_in):
+        """
+        Same derivation as PScan.backward, chunk by chunk from the end: the reverse scan
+        G[t] = grad[t] + A[t+1] * G[t+1] carries A[end] * G[end] into the last step of each chunk.
+
+        Args:
+            ctx : A_in : (B, L, D, N), H : (B, L, D, N)
+            grad_output_in : (B, L, D, N)
+
+        Returns:
+            gradA : (B, L, D, N), gradX : (B, L, D, N), None
+        """
+
+        A_in, H = ctx.saved_tensors
+        chunk = ctx.chunk
+        L = grad_output_in.size(1)
+
+        G = torch.empty_like(grad_output_in)
+        for start in reversed(range(0, L, chunk)):
+            end = min(start + chunk, L)
+            pad = chunk - (end - start)
+
+            grad_output = F.pad(grad_output_in[:, start:end], (0, 0, 0, 0, 0, pad)) # (B, chunk, D, N)
+            # A shifted 1 to the left within the chunk (see hand derivation), the step
+            # crossing into the next chunk is carried explicitly
+            A = F.pad(A_in[:, start + 1:end], (0, 0, 0, 0, 0, pad + 1)) # (B, chunk, D, N)
+            if end < L:
+                grad_output[:, end - start - 1].add_(A_in[:, end] * G[:, end])
+
+            # reverse parallel scan of the chunk (modifies grad_output in-place)
+            PScan.pscan_rev(A.transpose(2, 1), grad_output.transpose(2, 1))
+
+            G[:, start:end] = grad_output[:, :end - start]
+
+        Q = torch.zeros_like(H)
+        Q[:, 1:].add_(H[:, :-1] * G[:, 1:])
+
+        return Q, G, None
+
+def pscan_chunked(A, X, chunk=64):
+    """
+    Parallel scan H[t] = A[t] * H[t-1] + X[t] over chunks of `chunk` steps (a power of two),
+    without padding the whole sequence. See PScanChunked.
+
+    Args:
+        A : (B, L, D, N)
+        X : (B, L, D, N)
+
+    Returns:
+        H : (B, L, D, N)
+    """
+    if chunk != npo2(chunk):
+        raise ValueError(f"chunk must be a power of two, got {chunk}")
+    return PScanChunked.apply(A, X, chunk)
@@ -0,0 +1,55 @@
+#%% bench_features.py, compares the pandas and fused build_features implementations
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# This line gets the directory where the current file is located
+current_file_directory = os.path.dirname(__file__)
+
+# Get the parent parent directory of the current script's directory
+parent_directory = os.path.abspath(os.path.join(current_file_directory, os.pardir, os.pardir))
+sys.path.append(parent_directory)
+
+from src.features.build_features import build_features
+
+FEATURE_COLUMNS = ['ma_5', 'ma_20', 'ma_50', 'rsi', 'bb_high', 'bb_low']
+
+def make_panel(n_symbols, n_dates, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(n_symbols, n_dates)), axis=1))
+    return pd.DataFrame({
+        'symbol': np.repeat([f"S{i:04d}" for i in range(n_symbols)], n_dates),
+        'close': close.ravel()
+    })
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=1000, help='Number of synthetic symbols.')
+    parser.add_argument('--dates', type=int, default=5000, help='Number of bars per symbol.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported).')
+    args = parser.parse_args()
+
+    os.environ['RUNNING_TESTS'] = 'True'  # allow short histories
+    data = make_panel(args.symbols, args.dates)
+    print(f"{len(data):,} rows, {args.symbols} symbols")
+
+    expected, pandas_time = best_of(lambda: build_features(data.copy(), method='pandas'), args.repeat)
+    result, fused_time = best_of(lambda: build_features(data.copy(), method='fused'), args.repeat)
+
+    error = max(np.nanmax(np.abs(expected[c].to_numpy() - result[c].to_numpy())) for c in FEATURE_COLUMNS)
+    print(f"pandas {pandas_time:8.3f}s")
+    print(f"fused  {fused_time:8.3f}s  ({pandas_time / fused_time:.1f}x), max abs difference {error:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#%% bench_indicators.py, times every add_* indicator at growing sizes to check they scale linearly
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# This line gets the directory where the current file is located
+current_file_directory = os.path.dirname(__file__)
+
+# Get the parent parent directory of the current script's directory
+parent_directory = os.path.abspath(os.path.join(current_file_directory, os.pardir, os.pardir))
+sys.path.append(parent_directory)
+
+from src.features.build_features import (add_moving_averages, add_rsi, add_bollinger_bands, add_ema, add_macd,
+                                         add_atr, add_obv, add_vwap, add_stochastic, add_zscore, add_log_returns)
+
+INDICATORS = [add_moving_averages, add_rsi, add_bollinger_bands, add_ema, add_macd, add_atr,
+              add_obv, add_vwap, add_stochastic, add_zscore, add_log_returns]
+
+def make_panel(n_rows, n_dates, seed=0):
+    rng = np.random.default_rng(seed)
+    n_symbols = max(n_rows // n_dates, 1)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(n_symbols, n_dates)), axis=1)).ravel()
+    spread = np.abs(rng.normal(0, 0.5, size=close.shape))
+    return pd.DataFrame({
+        'symbol': np.repeat([f"S{i:05d}" for i in range(n_symbols)], n_dates),
+        'close': close,
+        'high': close + spread,
+        'low': close - spread,
+        'volume': rng.integers(1000, 1000000, size=close.shape)
+    })
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 3000000, 10000000],
+                        help='Panel sizes to time.')
+    parser.add_argument('--dates', type=int, default=5000, help='Number of bars per symbol.')
+    args = parser.parse_args()
+
+    os.environ['RUNNING_TESTS'] = 'True'  # allow short histories
+    timings = {}
+    for n_rows in args.rows:
+        data = make_panel(n_rows, args.dates)
+        for add in INDICATORS:
+            start = time.perf_counter()
+            add(data.copy())
+            timings[add.__name__, n_rows] = time.perf_counter() - start
+        del data
+
+    # Linear time means a constant time per row as the panel grows
+    header = ''.join(f"{n:>14,}" for n in args.rows)
+    print(f"{'ns per row':<22}{header}   largest/smallest")
+    for add in INDICATORS:
+        per_row = [timings[add.__name__, n] / n * 1e9 for n in args.rows]
+        cells = ''.join(f"{t:>14.1f}" for t in per_row)
+        print(f"{add.__name__:<22}{cells}   {per_row[-1] / per_row[0]:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
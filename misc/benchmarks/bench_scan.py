@@ -0,0 +1,75 @@
+#%% bench_scan.py, times the selective scan backends of MambaBlock (pscan, sequential, compiled) across L, ED and N
+import os
+import sys
+import time
+import argparse
+import itertools
+import torch
+
+# This line gets the directory where the current file is located
+current_file_directory = os.path.dirname(__file__)
+
+# Get the parent parent directory of the current script's directory
+parent_directory = os.path.abspath(os.path.join(current_file_directory, os.pardir, os.pardir))
+sys.path.append(parent_directory)
+
+from deprecated.mamba import MambaBlock, MambaConfig
+
+def make_inputs(batch, length, d_inner, d_state, seed=0):
+    """Random (x, Δ, A, B, C, D) shaped as MambaBlock.ssm passes them to the scan."""
+    generator = torch.Generator().manual_seed(seed)
+    return [
+        torch.randn(batch, length, d_inner, generator=generator),
+        torch.rand(batch, length, d_inner, generator=generator) * 0.1,
+        -torch.rand(d_inner, d_state, generator=generator),
+        torch.randn(batch, length, d_state, generator=generator),
+        torch.randn(batch, length, d_state, generator=generator),
+        torch.randn(d_inner, generator=generator)
+    ]
+
+def time_scan(scan, inputs, backward, repeats):
+    """Best time of `repeats` calls, after one warm-up call (which compiles the compiled backend)."""
+    for tensor in inputs:
+        tensor.requires_grad_(backward)
+    best = float('inf')
+    for i in range(repeats + 1):
+        start = time.perf_counter()
+        with torch.set_grad_enabled(backward):
+            y = scan(*inputs)
+            if backward:
+                y.sum().backward()
+        if i:
+            best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lengths', type=int, nargs='+', default=[256, 1024, 4096], help='Sequence lengths L.')
+    parser.add_argument('--d-inner', type=int, nargs='+', default=[32, 128], help='Inner dimensions ED.')
+    parser.add_argument('--d-state', type=int, nargs='+', default=[16, 64], help='State sizes N.')
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--steps', type=int, default=16, help='Steps per compiled call (MambaConfig.compiled_scan).')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seq-max-length', type=int, default=1024,
+                        help='Skip the sequential scan above this length, it is a Python loop over L.')
+    args = parser.parse_args()
+
+    backends = ['pscan', 'seq', 'compiled']
+    print(f"{'L':>6}{'ED':>6}{'N':>5}  {'mode':<8}" + ''.join(f"{b + ' (ms)':>16}" for b in backends)
+          + f"{'compiled vs pscan':>20}")
+    for length, d_inner, d_state in itertools.product(args.lengths, args.d_inner, args.d_state):
+        # d_model = ED / expand_factor, only the scan is timed so the projections do not matter
+        block = MambaBlock(MambaConfig(d_model=d_inner // 2, n_layers=1, d_state=d_state, compiled_scan=args.steps))
+        scans = {'pscan': block.selective_scan, 'seq': block.selective_scan_seq, 'compiled': block.selective_scan_compiled}
+        inputs = make_inputs(args.batch, length, d_inner, d_state)
+        for mode, backward in [('fwd', False), ('fwd+bwd', True)]:
+            timings = {}
+            for backend in backends:
+                if backend == 'seq' and length > args.seq_max_length:
+                    continue
+                timings[backend] = time_scan(scans[backend], inputs, backward, args.repeats)
+            cells = ''.join(f"{timings[b] * 1e3:>16.1f}" if b in timings else f"{'-':>16}" for b in backends)
+            print(f"{length:>6}{d_inner:>6}{d_state:>5}  {mode:<8}{cells}{timings['pscan'] / timings['compiled']:>19.1f}x")
+
+if __name__ == "__main__":
+    main()
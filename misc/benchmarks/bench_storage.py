@@ -0,0 +1,80 @@
+#%% bench_storage.py, compares the CSV and Parquet storage paths on a synthetic multi-symbol dataset
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# This line gets the directory where the current file is located
+current_file_directory = os.path.dirname(__file__)
+
+# Get the parent parent directory of the current script's directory
+parent_directory = os.path.abspath(os.path.join(current_file_directory, os.pardir, os.pardir))
+sys.path.append(parent_directory)
+
+from src.data.save_data import save_data_to_csv, save_data_to_parquet
+from src.data.load_data import load_stock_data
+
+def make_synthetic_data(n_rows, n_symbols=1000, seed=0):
+    """
+    Builds a long-format frame shaped like fetch_stock_data output: n_symbols tickers
+    sharing one business-day calendar, random-walk prices.
+    """
+    rng = np.random.default_rng(seed)
+    n_dates = int(np.ceil(n_rows / n_symbols))
+    dates = pd.bdate_range('2000-01-03', periods=n_dates)
+    symbols = np.array([f"S{i:04d}" for i in range(n_symbols)])
+
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(n_symbols, n_dates)), axis=1)).ravel()[:n_rows]
+    data = pd.DataFrame({
+        'date': np.tile(dates.values, n_symbols)[:n_rows],
+        'symbol': np.repeat(symbols, n_dates)[:n_rows],
+        'open': close * (1 + rng.normal(0, 0.002, n_rows)),
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.integers(1_000, 1_000_000, n_rows),
+    })
+    return data
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000, help='Number of synthetic rows.')
+    parser.add_argument('--symbols', type=int, default=1000, help='Number of synthetic symbols.')
+    args = parser.parse_args()
+
+    data = make_synthetic_data(args.rows, args.symbols)
+    workdir = tempfile.mkdtemp(prefix='plato_bench_')
+    csv_path = os.path.join(workdir, 'prices.csv')
+    parquet_path = os.path.join(workdir, 'prices')
+    try:
+        _, csv_write = timed(save_data_to_csv, data, csv_path)
+        _, csv_read = timed(pd.read_csv, csv_path, parse_dates=['date'])
+        _, csv_one = timed(lambda: pd.read_csv(csv_path).query("symbol == 'S0001'"))
+
+        _, pq_write = timed(save_data_to_parquet, data, parquet_path, append=False)
+        _, pq_read = timed(load_stock_data, None, source=parquet_path)
+        _, pq_one = timed(load_stock_data, 'S0001', source=parquet_path)
+
+        print(f"{len(data):,} rows, {args.symbols} symbols")
+        print(f"{'format':<10}{'write s':>10}{'read s':>10}{'1 symbol s':>12}{'size MB':>10}")
+        print(f"{'csv':<10}{csv_write:>10.2f}{csv_read:>10.2f}{csv_one:>12.2f}{directory_size(csv_path) / 1e6:>10.1f}")
+        print(f"{'parquet':<10}{pq_write:>10.2f}{pq_read:>10.2f}{pq_one:>12.2f}{directory_size(parquet_path) / 1e6:>10.1f}")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+    main()
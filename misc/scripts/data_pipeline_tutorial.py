@@ -1,9 +1,9 @@
 import datetime
 import os
 from sqlalchemy import create_engine
-from src.data.fetch_data import fetch_stock_data
+from src.data.price_cache import PriceCache
 from src.data.process_data import prepare_data, clean_data
-from src.features.build_features import build_features
+from src.features.feature_cache import FeatureCache
 from src.data.save_data import save_data_to_csv, save_data_to_db
 
 # This line gets the directory where the current file is located
@@ -20,6 +20,8 @@ os.makedirs(data_directory, exist_ok=True)
 
 CSV_FILENAME = os.path.join(data_directory, "S&P_stock_data.csv")
 DATABASE_URL = f"sqlite:///{os.path.join(data_directory, 'S&P_stock_data.db')}"
+CACHE_DIRECTORY = os.path.join(data_directory, "price_cache")
+FEATURE_CACHE_DIRECTORY = os.path.join(data_directory, "feature_cache")
 
 # Configuration
 TICKER_SYMBOL = "^GSPC"
@@ -29,12 +31,18 @@ TABLE_NAME = "stock_data"
 
 def run_data_pipeline(ticker_symbol, start_date, end_date, csv_filename, database_url, table_name):
     # Fetch stock data
+    # Only dates missing from the local cache are downloaded, full refresh once a week
     print(f"Fetching data for {ticker_symbol} from {start_date} to {end_date}...")
-    data = fetch_stock_data(ticker_symbol, start_date, end_date)
+    cache = PriceCache(CACHE_DIRECTORY, ttl='7D')
+    data = cache.fetch(ticker_symbol, start_date, end_date)
+
+    # Features are cached on disk: prepare_data below reuses them, and a rerun after new
+    # bars were appended only recomputes the tail
+    feature_cache = FeatureCache(FEATURE_CACHE_DIRECTORY, max_bytes=512 * 1024 ** 2)
 
     # Run through preprocessing before splitting
     dataFull = clean_data(data) # Clean raw data
-    dataFull = build_features(dataFull) # Add features
+    dataFull = feature_cache.build_features(dataFull) # Add features
 
     # Save the processed full data to a CSV file
     print(f"Saving full data to {csv_filename}...")
@@ -42,7 +50,7 @@ def run_data_pipeline(ticker_symbol, start_date, end_date, csv_filename, databas
     
     # Process the data into training
     print("Processing training data...")
-    train_data, _ = prepare_data(data,0.1)
+    train_data, _ = prepare_data(data,0.1, feature_cache=feature_cache)
 
     # Split the filename from its extension
     filename, file_extension = os.path.splitext(csv_filename)
@@ -54,9 +62,9 @@ def run_data_pipeline(ticker_symbol, start_date, end_date, csv_filename, databas
     print(f"Saving data to {train_csv_filename}...")
     save_data_to_csv(train_data, train_csv_filename)
     
-    # Save the processed training data to a database
+    # Save the processed training data to a database (upserting, so the tutorial can be re-run)
     print(f"Saving data to database {database_url}, table {table_name}...")
-    save_data_to_db(train_data, database_url, table_name)
+    save_data_to_db(train_data, database_url, table_name, upsert=True)
     
     print("Data pipeline completed successfully.")
 
@@ -2,39 +2,209 @@
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
 import uuid
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def fetch_stock_data(ticker_symbol, start_date, end_date):
+logger = logging.getLogger(__name__)
+
+def yahoo_history(ticker_symbol, start_date, end_date):
     """
-    Fetches historical stock data for a given ticker symbol from Yahoo Finance,
-    and includes the ticker symbol and a unique ID for each row.
+    Default data provider: downloads raw daily history for one symbol from Yahoo Finance.
+
+    Any callable with this signature can be passed as the `provider` of the fetch functions,
+    which makes it easy to swap in another vendor or a local fake for testing.
 
     Parameters:
     - ticker_symbol (str): The ticker symbol of the stock (e.g., 'AAPL').
     - start_date (str): The start date for the data fetch (format: 'YYYY-MM-DD').
     - end_date (str): The end date for the data fetch (format: 'YYYY-MM-DD').
-    # this model is beyond all reason
+
     Returns:
-    - pandas.DataFrame: DataFrame containing the fetched stock data along with an 'id' and 'symbol' column.
+    - pandas.DataFrame: Raw history as returned by the vendor, indexed by date.
     """
     ticker = yf.Ticker(ticker_symbol)
-    data = ticker.history(start=start_date, end=end_date)
+    return ticker.history(start=start_date, end=end_date)
+
+def make_row_ids(symbols, dates):
+    """
+    Computes a deterministic 64-bit row key from (symbol, date) pairs, fully vectorized.
+
+    The same symbol and date always map to the same key, across runs and machines, so the
+    key can be used to index, deduplicate and upsert rows downstream.
+
+    Parameters:
+    - symbols (array-like): Ticker symbol of each row.
+    - dates (array-like): Date of each row (anything pandas.to_datetime understands).
+
+    Returns:
+    - numpy.ndarray: int64 keys, one per row.
+    """
+    # Hash each distinct symbol once (pandas uses a fixed SipHash key, so this is stable)
+    codes, uniques = pd.factorize(np.asarray(symbols, dtype=object))
+    symbol_hash = pd.util.hash_array(np.asarray(uniques, dtype=object))[codes]
+    days = pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int64).astype(np.uint64)
+
+    # Combine and scramble with the splitmix64 finalizer (uint64 arithmetic wraps around)
+    key = symbol_hash ^ (days * np.uint64(0x9E3779B97F4A7C15))
+    key ^= key >> np.uint64(30)
+    key *= np.uint64(0xBF58476D1CE4E5B9)
+    key ^= key >> np.uint64(27)
+    key *= np.uint64(0x94D049BB133111EB)
+    key ^= key >> np.uint64(31)
+    return key.view(np.int64)
+
+def _format_history(data, ticker_symbol, id_mode='uuid'):
+    """
+    Turns a raw provider frame into our standard layout, in place: date as a column,
+    lowercase headers, 'symbol' and 'id' columns, sorted by date.
+    """
     data.reset_index(inplace=True) # Reset index and get date as just another data field
-    
+
     # Include the ticker symbol as a column
     data['symbol'] = ticker_symbol.upper()  # Assuming you want the symbol in uppercase
-    # Inside your fetch_stock_data function, after resetting the index
-    data['id'] = [str(uuid.uuid4()) for _ in range(len(data))]
     # Convert column names to lowercase
     data.columns = data.columns.str.lower()
     data['date'] = pd.to_datetime(data['date']).dt.date # Convert datetime value
+
+    if id_mode == 'uuid':
+        data['id'] = [str(uuid.uuid4()) for _ in range(len(data))]
+    elif id_mode == 'hash':
+        data['id'] = make_row_ids(data['symbol'], data['date'])
+    else:
+        raise ValueError(f"Unknown id_mode '{id_mode}', expected 'uuid' or 'hash'")
+
     data.sort_values(by='date', inplace=True)  # Use lowercase 'date' to match column names
     return data
 
+def fetch_stock_data(ticker_symbol, start_date, end_date, provider=None, id_mode='uuid'):
+    """
+    Fetches historical stock data for a given ticker symbol from Yahoo Finance,
+    and includes the ticker symbol and a unique ID for each row.
+
+    Parameters:
+    - ticker_symbol (str): The ticker symbol of the stock (e.g., 'AAPL').
+    - start_date (str): The start date for the data fetch (format: 'YYYY-MM-DD').
+    - end_date (str): The end date for the data fetch (format: 'YYYY-MM-DD').
+    - provider (callable, optional): Function (symbol, start, end) -> raw DataFrame. Defaults to Yahoo Finance.
+    - id_mode (str): 'uuid' for a random UUID string per row, 'hash' for a stable int64 key of (symbol, date).
+    # this model is beyond all reason
+    Returns:
+    - pandas.DataFrame: DataFrame containing the fetched stock data along with an 'id' and 'symbol' column.
+    """
+    provider = provider or yahoo_history
+    data = provider(ticker_symbol, start_date, end_date)
+    return _format_history(data, ticker_symbol, id_mode=id_mode)
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces out calls so that at most `calls_per_second`
+    requests start per second across all worker threads.
+    """
+
+    def __init__(self, calls_per_second):
+        self.interval = 1.0 / calls_per_second if calls_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        """Blocks until the caller is allowed to issue its next request."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def _fetch_with_retry(ticker_symbol, start_date, end_date, provider, id_mode, limiter, retries, backoff):
+    """
+    Fetches one symbol, retrying failed requests with exponential backoff
+    (backoff, 2*backoff, 4*backoff, ... seconds).
+    """
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            return fetch_stock_data(ticker_symbol, start_date, end_date, provider=provider, id_mode=id_mode)
+        except Exception as exc:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning("Fetch of %s failed (%s), retrying in %.1fs", ticker_symbol, exc, delay)
+            time.sleep(delay)
+
+def iter_stock_data(symbols, start_date, end_date, max_workers=8, provider=None,
+                    retries=3, backoff=1.0, calls_per_second=None, id_mode='uuid'):
+    """
+    Fetches several symbols concurrently on a bounded thread pool and yields each
+    symbol's DataFrame as soon as it finishes (completion order, not input order).
+
+    Symbols that still fail after all retries are logged and skipped.
+
+    Parameters:
+    - symbols (list): Ticker symbols to fetch.
+    - start_date (str): The start date for the data fetch (format: 'YYYY-MM-DD').
+    - end_date (str): The end date for the data fetch (format: 'YYYY-MM-DD').
+    - max_workers (int): Maximum number of concurrent requests.
+    - provider (callable, optional): Function (symbol, start, end) -> raw DataFrame. Defaults to Yahoo Finance.
+    - retries (int): Number of retries per symbol after the first failed attempt.
+    - backoff (float): Base delay in seconds for the exponential backoff between retries.
+    - calls_per_second (float, optional): Global request rate limit, None for no limit.
+    - id_mode (str): Row id scheme, see fetch_stock_data.
+
+    Yields:
+    - tuple: (symbol, pandas.DataFrame) for every successfully fetched symbol.
+    """
+    limiter = RateLimiter(calls_per_second)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(_fetch_with_retry, symbol, start_date, end_date,
+                            provider, id_mode, limiter, retries, backoff): symbol
+            for symbol in symbols
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                data = future.result()
+            except Exception as exc:
+                logger.error("Giving up on %s: %s", symbol, exc)
+                continue
+            yield symbol, data
+    finally:
+        # When the consumer stops early (break, exception, close()), drop the fetches that have not
+        # started instead of waiting for the whole universe; the ones in flight finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_many_stock_data(symbols, start_date, end_date, max_workers=8, provider=None,
+                          retries=3, backoff=1.0, calls_per_second=None, id_mode='uuid'):
+    """
+    Fetches historical data for many symbols concurrently and returns one long-format
+    DataFrame (one row per symbol and date), sorted by symbol then date.
+
+    See iter_stock_data for the parameters; use it directly to stream per-symbol
+    frames as they finish instead of waiting for the whole universe.
+
+    Returns:
+    - pandas.DataFrame: Concatenated data for all symbols that were fetched successfully.
+    """
+    frames = [data for _, data in iter_stock_data(symbols, start_date, end_date, max_workers=max_workers,
+                                                  provider=provider, retries=retries, backoff=backoff,
+                                                  calls_per_second=calls_per_second, id_mode=id_mode)]
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames, ignore_index=True)
+    data.sort_values(by=['symbol', 'date'], inplace=True, ignore_index=True)
+    return data
+
 if __name__ == "__main__":
     # Example usage
     symbol = "AAPL"
     start = "2020-01-01"
     end = "2021-01-01"
     data = fetch_stock_data(symbol, start, end)
-    print(data.head())
\ No newline at end of file
+    print(data.head())
@@ -0,0 +1,153 @@
+# src/data/load_data.py
+
+import numpy as np
+import pandas as pd
+from functools import reduce
+import pyarrow as pa
+import pyarrow.dataset as ds
+from sqlalchemy import MetaData, Table, inspect, select
+from src.data.save_data import get_engine, partition_table_name
+
+"""
+IMPORTANT DATA TIP: WE ENFORCE LOWER CASE FOR PANDA HEADERS!!! 😠
+"""
+
+def _is_database_url(source):
+    return '://' in str(source)
+
+def _as_list(symbols):
+    if symbols is None:
+        return None
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    return [s.upper() for s in symbols]
+
+def _coerce_types(data, float32=False):
+    """
+    Gives loaded columns their proper dtypes: datetime64 dates, float64 (or float32)
+    prices and features, int64 volume.
+    """
+    if 'date' in data.columns:
+        data['date'] = pd.to_datetime(data['date'])
+    float_type = np.float32 if float32 else np.float64
+    for column in data.columns:
+        if column in ('date', 'symbol', 'id'):
+            continue
+        if column == 'volume' and not data[column].isna().any():
+            data[column] = data[column].astype(np.int64)
+        elif pd.api.types.is_numeric_dtype(data[column]):
+            data[column] = data[column].astype(float_type)
+    return data
+
+def _date_scalar(field_type, value):
+    """Converts a bound to a pyarrow scalar comparable with the stored date column."""
+    value = pd.Timestamp(value)
+    if pa.types.is_date(field_type):
+        return pa.scalar(value.date(), type=field_type)
+    if pa.types.is_timestamp(field_type) and field_type.tz is not None:
+        value = value.tz_localize(field_type.tz) if value.tz is None else value
+    return pa.scalar(value.to_pydatetime(), type=field_type)
+
+def _iter_parquet(path, symbols, start_date, end_date, columns, chunksize):
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    schema = dataset.schema
+    if columns is None and 'year' in schema.names and 'date' in schema.names:
+        # 'year' is a partition key derived from 'date' by save_data_to_parquet, not data
+        columns = [name for name in schema.names if name != 'year']
+
+    predicates = []
+    if symbols is not None:
+        predicates.append(ds.field('symbol').isin(symbols))
+    if start_date is not None:
+        predicates.append(ds.field('date') >= _date_scalar(schema.field('date').type, start_date))
+    if end_date is not None:
+        predicates.append(ds.field('date') < _date_scalar(schema.field('date').type, end_date))
+    condition = reduce(lambda a, b: a & b, predicates) if predicates else None
+
+    # Only the requested columns are decoded, filters prune partitions and row groups
+    if chunksize is None:
+        yield dataset.to_table(columns=columns, filter=condition).to_pandas()
+        return
+    for batch in dataset.to_batches(columns=columns, filter=condition, batch_size=chunksize):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def _tables_to_read(engine, table_name, partition_by, symbols, start_date, end_date):
+    """Lists the (existing) tables holding the requested rows."""
+    existing = set(inspect(engine).get_table_names())
+    if partition_by is None:
+        tables = [table_name]
+    elif partition_by == 'symbol' and symbols is not None:
+        tables = [partition_table_name(table_name, 'symbol', s) for s in symbols]
+    elif partition_by == 'year' and start_date is not None and end_date is not None:
+        first, last = pd.Timestamp(start_date).year, pd.Timestamp(end_date).year
+        tables = [partition_table_name(table_name, 'year', y) for y in range(first, last + 1)]
+    else:
+        prefix = f"{table_name}__"
+        tables = sorted(t for t in existing if t.startswith(prefix))
+    return [t for t in tables if t in existing]
+
+def _iter_sql(database_url, table_name, partition_by, symbols, start_date, end_date, columns, chunksize):
+    engine = get_engine(database_url)
+    metadata = MetaData()
+    for name in _tables_to_read(engine, table_name, partition_by, symbols, start_date, end_date):
+        table = Table(name, metadata, autoload_with=engine)
+        selected = [table.c[c] for c in columns] if columns is not None else [table]
+        stmt = select(*selected)
+        # These predicates hit the (symbol, date) primary key, so only the range is scanned
+        if symbols is not None:
+            stmt = stmt.where(table.c.symbol.in_(symbols))
+        if start_date is not None:
+            stmt = stmt.where(table.c.date >= pd.Timestamp(start_date).date())
+        if end_date is not None:
+            stmt = stmt.where(table.c.date < pd.Timestamp(end_date).date())
+        stmt = stmt.order_by(table.c.symbol, table.c.date)
+
+        with engine.connect() as conn:
+            conn = conn.execution_options(stream_results=chunksize is not None)
+            if chunksize is None:
+                yield pd.read_sql(stmt, conn)
+            else:
+                for chunk in pd.read_sql(stmt, conn, chunksize=chunksize):
+                    yield chunk
+
+def load_stock_data(symbols, start_date=None, end_date=None, source='sqlite:///stock_data.db',
+                    table_name='stock_data', partition_by=None, columns=None, chunksize=None, float32=False):
+    """
+    Reads a symbol/date range from the stock SQL table or a (partitioned) Parquet dataset,
+    pushing the symbol and date predicates down to the storage so that only the
+    requested rows and columns are read.
+
+    Parameters:
+    - symbols (str or list): Ticker symbol(s) to load, None for every symbol.
+    - start_date (str, optional): First date to load (format: 'YYYY-MM-DD').
+    - end_date (str, optional): End of the range, exclusive (format: 'YYYY-MM-DD').
+    - source (str): Database URL (e.g. 'sqlite:///stock_data.db') or path of a Parquet file/directory.
+    - table_name (str): Table to read when `source` is a database.
+    - partition_by (str, optional): Partition strategy the table was written with (None, 'symbol' or 'year').
+    - columns (list, optional): Columns to read, all by default.
+    - chunksize (int, optional): When set, return an iterator of DataFrames of at most this many rows
+      (Parquet chunks follow file order rather than a global symbol/date order).
+    - float32 (bool): Return float columns as float32 instead of float64.
+
+    Returns:
+    - pandas.DataFrame sorted by symbol and date, or an iterator of DataFrames when `chunksize` is set.
+    """
+    symbols = _as_list(symbols)
+    if _is_database_url(source):
+        chunks = _iter_sql(source, table_name, partition_by, symbols, start_date, end_date, columns, chunksize)
+    else:
+        chunks = _iter_parquet(source, symbols, start_date, end_date, columns, chunksize)
+
+    chunks = (_coerce_types(chunk, float32) for chunk in chunks)
+    if chunksize is not None:
+        return chunks
+
+    frames = list(chunks)
+    if not frames:
+        return pd.DataFrame(columns=columns) if columns is not None else pd.DataFrame()
+    data = pd.concat(frames, ignore_index=True)
+    order = [c for c in ('symbol', 'date') if c in data.columns]
+    if order:
+        data.sort_values(by=order, inplace=True, ignore_index=True)
+    return data
@@ -0,0 +1,133 @@
+# src/data/price_cache.py
+
+import os
+import re
+import json
+import time
+import logging
+import pandas as pd
+from src.data.fetch_data import fetch_stock_data
+
+logger = logging.getLogger(__name__)
+
+class PriceCache:
+    """
+    Local on-disk cache of daily price history, one Parquet file per symbol plus a small
+    JSON sidecar recording the covered date range and when it was last fully downloaded.
+
+    Requests that fall inside the covered range are served from disk without touching the
+    provider. Requests that extend past it only download the missing dates and merge them in.
+    Set `ttl` to force a full re-download after a while so that restated history
+    (splits, dividends adjustments) is picked up, or call invalidate() explicitly.
+    """
+
+    def __init__(self, cache_dir, ttl=None, provider=None, id_mode='uuid'):
+        """
+        Parameters:
+        - cache_dir (str): Directory holding the cached files, created if missing.
+        - ttl (optional): Maximum age of a full download before it is refetched, anything
+          pandas.Timedelta accepts (e.g. '7D', datetime.timedelta). None never expires.
+        - provider (callable, optional): Function (symbol, start, end) -> raw DataFrame. Defaults to Yahoo Finance.
+        - id_mode (str): Row id scheme for downloaded rows, see fetch_stock_data.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = pd.Timedelta(ttl) if ttl is not None else None
+        self.provider = provider
+        self.id_mode = id_mode
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, symbol):
+        name = re.sub(r'[^A-Za-z0-9^._-]', '_', symbol.upper())
+        base = os.path.join(self.cache_dir, name)
+        return base + '.parquet', base + '.json'
+
+    def _read_meta(self, symbol):
+        data_path, meta_path = self._paths(symbol)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write(self, symbol, data, meta):
+        # Write to temporary files first so a crash never leaves a half-written cache entry
+        data_path, meta_path = self._paths(symbol)
+        data.to_parquet(data_path + '.tmp', index=False)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(data_path + '.tmp', data_path)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _is_expired(self, meta):
+        if self.ttl is None:
+            return False
+        return time.time() - meta['fetched_at'] >= self.ttl.total_seconds()
+
+    def _download(self, symbol, start_date, end_date):
+        logger.info("Downloading %s from %s to %s", symbol, start_date, end_date)
+        return fetch_stock_data(symbol, start_date, end_date, provider=self.provider, id_mode=self.id_mode)
+
+    def load(self, symbol):
+        """
+        Returns everything cached for a symbol, or None if nothing is cached.
+        """
+        if self._read_meta(symbol) is None:
+            return None
+        return pd.read_parquet(self._paths(symbol)[0])
+
+    def fetch(self, symbol, start_date, end_date):
+        """
+        Returns the history of `symbol` for [start_date, end_date), downloading only what
+        the cache does not already cover.
+
+        Parameters:
+        - symbol (str): The ticker symbol of the stock (e.g., 'AAPL').
+        - start_date (str): The start date (format: 'YYYY-MM-DD').
+        - end_date (str): The end date, exclusive like yfinance (format: 'YYYY-MM-DD').
+
+        Returns:
+        - pandas.DataFrame: Same layout as fetch_stock_data.
+        """
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        meta = self._read_meta(symbol)
+
+        if meta is None or self._is_expired(meta):
+            data = self._download(symbol, start_date, end_date)
+            meta = {'start': str(start.date()), 'end': str(end.date()), 'fetched_at': time.time()}
+            self._write(symbol, data, meta)
+            return data.reset_index(drop=True)
+
+        cached_start, cached_end = pd.Timestamp(meta['start']), pd.Timestamp(meta['end'])
+        data = pd.read_parquet(self._paths(symbol)[0])
+
+        pieces = []
+        if start < cached_start:
+            pieces.append(self._download(symbol, str(start.date()), meta['start']))
+        if end > cached_end:
+            # Restart from the last cached bar so a bar cached before the session closed gets replaced
+            last_bar = pd.Timestamp(data['date'].max()) if len(data) else cached_start
+            pieces.append(self._download(symbol, str(min(last_bar, cached_end).date()), str(end.date())))
+
+        if pieces:
+            data = pd.concat([data] + pieces, ignore_index=True)
+            data.drop_duplicates(subset='date', keep='last', inplace=True)
+            data.sort_values(by='date', inplace=True, ignore_index=True)
+            meta['start'] = str(min(start, cached_start).date())
+            meta['end'] = str(max(end, cached_end).date())
+            self._write(symbol, data, meta)
+
+        dates = pd.to_datetime(data['date'])
+        return data[(dates >= start) & (dates < end)].reset_index(drop=True)
+
+    def invalidate(self, symbol=None):
+        """
+        Drops the cache entry of one symbol, or of every symbol when `symbol` is None,
+        so the next fetch downloads the full history again.
+        """
+        if symbol is not None:
+            paths = self._paths(symbol)
+        else:
+            paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                     if name.endswith(('.parquet', '.json'))]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
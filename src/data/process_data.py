@@ -1,8 +1,12 @@
 import pandas as pd
 import numpy as np
 import os
+import json
 from sklearn.preprocessing import StandardScaler
-from src.features.build_features import build_features
+from src.features.build_features import build_features, _symbol_panel, _rolling, _apply_grouped
+from src.features.registry import compute_features
+from src.features.feature_store import FeatureStoreWriter
+from src.data.save_data import save_data_to_parquet
 
 """
 IMPORTANT DATA TIP: WE ENFORCE LOWER CASE FOR PANDA HEADERS!!! 😠
@@ -22,8 +26,9 @@ def clean_data(data):
     # TODO, figure out what else needs to be cleaned up\
     # Removes missing rows
     cleaned_data = data.dropna() 
-    # Remove duplicates, keeping the first occurrence
-    cleaned_data = cleaned_data.drop_duplicates(subset='date', keep='first')
+    # Remove duplicates, keeping the first occurrence (per symbol for multi-symbol frames)
+    keys = ['symbol', 'date'] if 'symbol' in cleaned_data.columns else 'date'
+    cleaned_data = cleaned_data.drop_duplicates(subset=keys, keep='first')
 
     return cleaned_data
 
@@ -31,6 +36,8 @@ def normalize_features(data):
     """
     Standardize all numeric features in the DataFrame by removing the mean and scaling to unit variance.
     Numeric columns are automatically detected and normalized.
+    The statistics come from every row passed in: to keep test data out of them, fit a
+    FeatureNormalizer on the training split instead.
 
     Parameters:
     - data (pandas.DataFrame): The input DataFrame containing stock data.
@@ -48,10 +55,139 @@ def normalize_features(data):
     
     return data
 
+class FeatureNormalizer:
+    """
+    Standardizes numeric features with statistics fitted on training data only, so the
+    exact same transform can be applied to test and live data later.
+
+    Identifier columns ('id') are left alone and heavy-tailed columns ('volume') are
+    log1p-transformed before scaling. partial_fit accumulates the statistics over chunks,
+    so a dataset larger than memory can be fitted in one streaming pass.
+    """
+
+    def __init__(self, columns=None, exclude=('id',), log_columns=('volume',)):
+        """
+        Parameters:
+        - columns (list, optional): Columns to standardize, every numeric column by default
+          (detected on the first fit).
+        - exclude (list): Numeric columns never standardized.
+        - log_columns (list): Columns log1p-transformed before scaling.
+        """
+        self.columns = list(columns) if columns is not None else None
+        self.exclude = list(exclude)
+        self.log_columns = list(log_columns)
+        self.scaler = StandardScaler()
+
+    @property
+    def is_fitted(self):
+        return hasattr(self.scaler, 'mean_')
+
+    def _values(self, data):
+        values = data[self.columns].to_numpy(dtype=np.float64, copy=True)
+        for i, column in enumerate(self.columns):
+            if column in self.log_columns:
+                values[:, i] = np.log1p(values[:, i])
+        return values
+
+    def partial_fit(self, data):
+        """
+        Updates the statistics with one chunk of training data.
+
+        Parameters:
+        - data (pandas.DataFrame): A chunk of the training data.
+
+        Returns:
+        - FeatureNormalizer: self.
+        """
+        if self.columns is None:
+            self.columns = [c for c in data.select_dtypes(include=[np.number]).columns if c not in self.exclude]
+        self.scaler.partial_fit(self._values(data))
+        return self
+
+    def fit(self, data):
+        """Fits the statistics on `data`, discarding any previous fit."""
+        self.scaler = StandardScaler()
+        return self.partial_fit(data)
+
+    def transform(self, data):
+        """
+        Standardizes the fitted columns of `data` in place.
+
+        Parameters:
+        - data (pandas.DataFrame): Data with the fitted columns.
+
+        Returns:
+        - pandas.DataFrame: The DataFrame with the columns standardized.
+        """
+        if not self.is_fitted:
+            raise ValueError("FeatureNormalizer is not fitted")
+        if len(data):
+            data[self.columns] = self.scaler.transform(self._values(data))
+        return data
+
+    def fit_transform(self, data):
+        return self.fit(data).transform(data)
+
+    def save(self, path):
+        """Writes the fitted state to a JSON file."""
+        state = {
+            'columns': self.columns,
+            'exclude': self.exclude,
+            'log_columns': self.log_columns,
+            'mean': self.scaler.mean_.tolist(),
+            'var': self.scaler.var_.tolist(),
+            'scale': self.scaler.scale_.tolist(),
+            'n_samples_seen': np.asarray(self.scaler.n_samples_seen_).tolist()
+        }
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path):
+        """Restores a normalizer written by save(), ready to transform without refitting."""
+        with open(path) as f:
+            state = json.load(f)
+        normalizer = cls(state['columns'], state['exclude'], state['log_columns'])
+        scaler = normalizer.scaler
+        scaler.mean_ = np.array(state['mean'])
+        scaler.var_ = np.array(state['var'])
+        scaler.scale_ = np.array(state['scale'])
+        scaler.n_samples_seen_ = np.array(state['n_samples_seen'])
+        scaler.n_features_in_ = len(state['columns'])
+        return normalizer
+
+def rolling_normalize(data, columns, window=252, expanding=False):
+    """
+    Standardizes columns with trailing statistics only (per symbol for panels), for
+    walk-forward use: a row is scaled by the mean and standard deviation of itself and
+    the rows before it, never by later ones.
+
+    Parameters:
+    - data (pandas.DataFrame): Date-ordered data, one symbol or a long-format panel.
+    - columns (list): Columns to standardize.
+    - window (int): Rolling window, or the minimum number of rows before the first value when `expanding`.
+    - expanding (bool): Use all previous rows instead of a rolling window.
+
+    Returns:
+    - pandas.DataFrame: The DataFrame with the columns standardized, NaN until `window` rows are available.
+    """
+    panel = _symbol_panel(data)
+    for column in columns:
+        series = data[column].astype(np.float64)
+        if expanding:
+            mean = _apply_grouped(series, panel, lambda s: s.expanding(min_periods=window).mean())
+            std = _apply_grouped(series, panel, lambda s: s.expanding(min_periods=window).std())
+        else:
+            mean = _rolling(series, window, panel)
+            std = _rolling(series, window, panel, stat='std')
+        data[column] = (series - mean) / std
+    return data
+
 def pad_missing_values(data):
     """
     Pads missing values for all columns in the DataFrame by applying forward fill 
     followed by backward fill. This method works for all data types.
+    Multi-symbol frames are filled per symbol, so no value crosses from one symbol to another.
 
     Parameters:
     - data (pandas.DataFrame): The input DataFrame containing stock data.
@@ -59,19 +195,110 @@ def pad_missing_values(data):
     Returns:
     - pandas.DataFrame: The DataFrame with missing values padded for all columns.
     """
-    for column in data.columns:
-        # Check if the column is numeric or categorical/textual
-        if pd.api.types.is_numeric_dtype(data[column]):
-            # For numeric columns, apply forward fill and backward fill
-            data[column] = data[column].fillna(method='ffill').fillna(method='bfill')
-        else:
-            # For non-numeric columns, we'll also apply ffill and bfill for simplicity.
-            # TODO?: potentially adjust later if non-numeric features aded
-            data[column] = data[column].fillna(method='ffill').fillna(method='bfill')
+    return _fill_per_symbol(_fill_per_symbol(data, 'ffill'), 'bfill')
 
+def _fill_per_symbol(data, method):
+    """Forward ('ffill') or backward ('bfill') fills every column, per symbol for multi-symbol frames."""
+    if 'symbol' in data.columns and data['symbol'].nunique() > 1:
+        # One grouped pass over the whole frame ('symbol' itself is the key)
+        filled = getattr(data.groupby(data['symbol'], sort=False), method)()
+        data[filled.columns] = filled
+    else:
+        data[data.columns] = getattr(data, method)()
     return data
 
-def prepare_data(data, test_size=0.2):
+# Fill policy of the standard columns in fill_gaps, other columns use its `default`
+DEFAULT_FILL_POLICY = {
+    'open': 'ffill', 'high': 'ffill', 'low': 'ffill', 'close': 'ffill', 'adj close': 'ffill',
+    'volume': 'zero', 'dividends': 'zero', 'stock splits': 'zero',
+    'id': None
+}
+FILL_POLICIES = ('ffill', 'bfill', 'zero', None)
+
+def _sessions(dates, calendar):
+    if calendar == 'union':
+        return pd.DatetimeIndex(dates.unique()).sort_values()
+    if isinstance(calendar, str):
+        return pd.date_range(dates.min(), dates.max(), freq=calendar)
+    return pd.DatetimeIndex(pd.to_datetime(calendar)).unique().sort_values()
+
+def fill_gaps(data, calendar='union', policy=None, limit=None, default='ffill'):
+    """
+    Makes missing sessions explicit rows and fills them (and any other missing value)
+    according to a per-column policy, per symbol and in a few whole-frame passes.
+
+    Each symbol is reindexed to the calendar's sessions between its own first and last
+    date, so a symbol is never extended before its listing or after its last bar.
+
+    Parameters:
+    - data (pandas.DataFrame): Stock data with a 'date' column (and 'symbol' for several symbols),
+      without duplicate (symbol, date) rows (see clean_data).
+    - calendar: Expected sessions. 'union' for every date at least one symbol of the frame
+      traded on, a pandas frequency string such as 'B' (business days), or a list of dates.
+    - policy (dict, optional): Column -> 'ffill', 'bfill', 'zero' or None (left missing), on top
+      of DEFAULT_FILL_POLICY (prices forward filled, volume zero, id left missing).
+      Integer columns left with missing values come back as nullable Int64.
+    - limit (int, optional): Maximum number of consecutive values forward/backward filled.
+    - default (str): Policy of the columns not listed anywhere.
+
+    Returns:
+    - pandas.DataFrame: Rows of every session, sorted by symbol and date.
+    """
+    policy = {**DEFAULT_FILL_POLICY, **(policy or {})}
+    unknown = {p for p in list(policy.values()) + [default] if p not in FILL_POLICIES}
+    if unknown:
+        raise ValueError(f"Unknown fill policies {sorted(unknown, key=str)}, expected one of {FILL_POLICIES}")
+
+    columns = list(data.columns)
+    dates = pd.to_datetime(data['date'])
+    as_date_objects = data['date'].dtype == object
+    has_symbol = 'symbol' in data.columns
+    symbols = data['symbol'].to_numpy() if has_symbol else np.zeros(len(data), dtype=np.int64)
+    sessions = _sessions(dates, calendar)
+
+    # Every (symbol, session) pair between each symbol's first and last date, without a per-symbol loop
+    codes, uniques = pd.factorize(symbols)
+    bounds = dates.groupby(codes).agg(['min', 'max'])
+    lo = sessions.searchsorted(bounds['min'].to_numpy(), side='left')
+    hi = sessions.searchsorted(bounds['max'].to_numpy(), side='right')
+    lengths = hi - lo
+    offsets = np.repeat(lo - (np.cumsum(lengths) - lengths), lengths)
+    expected = pd.MultiIndex.from_arrays(
+        [np.asarray(uniques)[np.repeat(bounds.index.to_numpy(), lengths)], sessions[np.arange(lengths.sum()) + offsets]],
+        names=['symbol', 'date'])
+
+    framed = data.drop(columns=[c for c in ('symbol', 'date') if c in columns])
+    framed.index = pd.MultiIndex.from_arrays([symbols, dates], names=['symbol', 'date'])
+    # Integer columns go nullable (Int64) rather than float64 for the new rows, which would round 64-bit hash ids
+    integer_columns = [c for c in framed.columns if pd.api.types.is_integer_dtype(framed[c])]
+    framed[integer_columns] = framed[integer_columns].convert_dtypes()
+    # Rows off the calendar are kept, not dropped
+    framed = framed.reindex(expected.union(framed.index))
+
+    by_policy = {}
+    for column in framed.columns:
+        by_policy.setdefault(policy.get(column, default), []).append(column)
+    groups = framed.groupby(level='symbol', sort=False)
+    if by_policy.get('ffill'):
+        framed[by_policy['ffill']] = groups[by_policy['ffill']].ffill(limit=limit)
+    if by_policy.get('bfill'):
+        framed[by_policy['bfill']] = groups[by_policy['bfill']].bfill(limit=limit)
+    if by_policy.get('zero'):
+        framed[by_policy['zero']] = framed[by_policy['zero']].fillna(0)
+
+    # Integer columns go back to their type once fully filled, and stay Int64 otherwise
+    for column in integer_columns:
+        if not framed[column].isna().any():
+            framed[column] = framed[column].astype(data[column].dtype)
+
+    result = framed.reset_index()
+    if as_date_objects:
+        result['date'] = result['date'].dt.date
+    if not has_symbol:
+        result = result.drop(columns='symbol')
+    return result[columns]
+
+def prepare_data(data, test_size=0.2, feature_cache=None, normalizer=None):
     """
     Prepares the data for modeling, including sorting by date and performing a train-test split.
     Assumes that you have a data size that is sufficiently the MIN_REQUIRED_LENGTH
@@ -80,16 +307,17 @@ def prepare_data(data, test_size=0.2):
     - data (pandas.DataFrame): The input DataFrame containing the stock data.
     - test_size (float): The proportion of the dataset to include in the test split.
     - random_state (int, optional): Controls the shuffling applied to the data before applying the split.
+    - feature_cache (FeatureCache, optional): Cache reusing features already built for the same data.
+    - normalizer (FeatureNormalizer, optional): Normalizer to use. Fitted on the training split
+      unless it is already fitted (e.g. loaded for inference), in which case it is only applied.
 
     Returns:
     - tuple: A tuple containing the training and testing datasets.
     """
     # Run through preprocessing before splitting
     data = clean_data(data) # Clean raw data
-    data = build_features(data) # Add features
-
-    if not os.getenv('RUNNING_TESTS'): #skip normalization in test
-        data = normalize_features(data) # Normalize Data
+    # Add features
+    data = feature_cache.build_features(data) if feature_cache is not None else build_features(data)
 
     data = pad_missing_values(data) # Pad missing values
     #data = clean_data(data) # clean data again to remove any nans added by adding features
@@ -100,11 +328,124 @@ def prepare_data(data, test_size=0.2):
     split_idx = int(len(data) * (1 - test_size))  # Use the sorted DataFrame directly
 
     # Perform the train-test split based on the calculated index
-    train = data.iloc[:split_idx]
-    test = data.iloc[split_idx:]
+    train = data.iloc[:split_idx].copy()
+    test = data.iloc[split_idx:].copy()
+
+    if not os.getenv('RUNNING_TESTS'): #skip normalization in test
+        # Normalize with statistics of the training split only, so the test split does not leak into them
+        normalizer = normalizer if normalizer is not None else FeatureNormalizer()
+        if not normalizer.is_fitted:
+            normalizer.fit(train)
+        train = normalizer.transform(train)
+        test = normalizer.transform(test)
 
     return train, test
 
+def iter_prepared_data(chunks, lookback=64, normalizer=None):
+    """
+    Chunked version of prepare_data's preprocessing (cleaning, features, padding) for
+    histories that do not fit in memory. The last `lookback` rows of every symbol are
+    carried into the next chunk, so rolling windows see across chunk boundaries and the
+    features match a single pass over the whole history. Memory use is bounded by one
+    chunk plus the carried rows.
+
+    A single pass back-fills the warm-up rows of a symbol (e.g. its first 49 rows for ma_50)
+    with the first values computed after them, which may be in a later chunk: the rows of a
+    symbol are held back until each of its columns has a value, then yielded back-filled.
+    With small chunks in date order, a symbol's first rows therefore come out with a later chunk.
+
+    Parameters:
+    - chunks (iterable): DataFrames in date order per symbol, e.g. load_stock_data(..., chunksize=...).
+    - lookback (int): Rows carried over per symbol, at least the longest feature window.
+    - normalizer (FeatureNormalizer, optional): Applied to every chunk if already fitted, otherwise
+      fitted incrementally (partial_fit) on the chunks as they go by and left unapplied.
+
+    Yields:
+    - pandas.DataFrame: The prepared rows of each chunk (and the held back rows it completes).
+    """
+    # Decided once: after the first partial_fit the normalizer already counts as fitted
+    fitting = normalizer is not None and not normalizer.is_fitted
+    carry, pending, warmed_up, n_rows = None, None, set(), 0
+
+    def prepared_rows(rows):
+        if fitting:
+            normalizer.partial_fit(rows)
+        elif normalizer is not None:
+            rows = normalizer.transform(rows.copy())
+        return rows.reset_index(drop=True)
+
+    for chunk in chunks:
+        n_carried = 0 if carry is None else len(carry)
+        combined = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+        combined = clean_data(combined.reset_index(drop=True))
+        if 'symbol' in combined.columns:
+            carry = combined.groupby('symbol', sort=False).tail(lookback)
+        else:
+            carry = combined.tail(lookback).copy()
+
+        # Same features as build_features, without its minimum length check: a chunk can start with few rows
+        combined = compute_features(combined)
+        combined = _fill_per_symbol(combined, 'ffill')
+        prepared = combined[combined.index >= n_carried]
+        # Rows numbered across chunks, to yield held back rows in their original order
+        prepared.index = np.arange(n_rows, n_rows + len(prepared))
+        n_rows += len(prepared)
+        if pending is not None:
+            prepared = pd.concat([pending, prepared])
+        if not len(prepared):
+            continue
+
+        # A symbol's warm-up is over once a forward-filled row has no NaN left
+        symbols = prepared['symbol'] if 'symbol' in prepared.columns else pd.Series(None, index=prepared.index)
+        last_rows = prepared.groupby(symbols, sort=False, dropna=False).tail(1)
+        warmed_up.update(symbols[last_rows.index[last_rows.notna().all(axis=1)]])
+        released = symbols.isin(warmed_up)
+        pending = prepared[~released] if not released.all() else None
+        if released.any():
+            yield prepared_rows(_fill_per_symbol(prepared[released].sort_index(), 'bfill'))
+
+    # Symbols with a column that never got a value, left as a single pass leaves them
+    if pending is not None:
+        yield prepared_rows(_fill_per_symbol(pending.sort_index(), 'bfill'))
+
+def prepare_data_to_file(chunks, path, format='parquet', lookback=64, normalizer=None, feature_columns=None):
+    """
+    Streams chunks through iter_prepared_data and writes each prepared chunk as it is
+    produced, so the full prepared history is never held in memory.
+
+    Parameters:
+    - chunks (iterable): DataFrames in date order per symbol.
+    - path (str): Output Parquet dataset directory or feature store directory (replaced).
+    - format (str): 'parquet' (save_data_to_parquet) or 'store' (FeatureStoreWriter; chunks must then
+      have a 'symbol' column and be ordered by symbol, then date, like SQL chunks from load_stock_data).
+    - lookback (int): See iter_prepared_data.
+    - normalizer (FeatureNormalizer, optional): See iter_prepared_data.
+    - feature_columns (list, optional): Columns of the feature store, all numeric columns except 'id' by default.
+
+    Returns:
+    - int: Number of rows written.
+    """
+    if format not in ('parquet', 'store'):
+        raise ValueError(f"Unknown format '{format}', expected 'parquet' or 'store'")
+
+    writer, n_rows = None, 0
+    try:
+        for prepared in iter_prepared_data(chunks, lookback, normalizer):
+            if format == 'parquet':
+                partition_by = ('symbol',) if 'symbol' in prepared.columns else None
+                save_data_to_parquet(prepared, path, partition_by=partition_by, append=n_rows > 0)
+            else:
+                if writer is None:
+                    columns = feature_columns or [c for c in prepared.select_dtypes(include=[np.number]).columns
+                                                  if c != 'id']
+                    writer = FeatureStoreWriter(path, columns)
+                writer.write_frame(prepared)
+            n_rows += len(prepared)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
 # Example usage
 if __name__ == "__main__":
     # Assume `data` is your DataFrame loaded from CSV
@@ -1,25 +1,291 @@
 # src/data/save_data.py
 
+import os
+import shutil
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import re
 import uuid
-from sqlalchemy import create_engine
+import time
+import logging
+import threading
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Boolean, Index, MetaData, Table
 from sqlalchemy.orm import sessionmaker
 
+logger = logging.getLogger(__name__)
+
+# Every stock table is keyed on (symbol, date)
+STOCK_KEY_COLUMNS = ('symbol', 'date')
+PARTITION_STRATEGIES = (None, 'symbol', 'year')
+
+def _column_type(dtype, float32=False):
+    """Maps a pandas dtype to the most compact SQL type that holds it."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return Boolean()
+    if pd.api.types.is_integer_dtype(dtype):
+        return BigInteger()
+    if pd.api.types.is_float_dtype(dtype):
+        # precision=24 is a 4-byte REAL on PostgreSQL (SQLite always stores 8-byte floats)
+        return Float(precision=24) if float32 else Float()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return DateTime()
+    return String()
+
+def stock_table(table_name, metadata, float32=False, id_type=None, extra_columns=()):
+    """
+    Builds the authoritative schema of a stock price table: composite (symbol, date)
+    primary key, an index on date for cross-sectional queries, float prices and an
+    integer volume.
+
+    Parameters:
+    - table_name (str): Name of the table.
+    - metadata (sqlalchemy.MetaData): Metadata the table is attached to.
+    - float32 (bool): Store prices as 4-byte floats instead of 8-byte doubles.
+    - id_type (sqlalchemy type, optional): Type of the 'id' column, BigInteger (hash ids) by default.
+    - extra_columns (list): Additional sqlalchemy Columns, e.g. engineered features.
+
+    Returns:
+    - sqlalchemy.Table: The table definition.
+    """
+    price = Float(precision=24) if float32 else Float()
+    return Table(
+        table_name, metadata,
+        Column('symbol', String(16), primary_key=True),
+        Column('date', Date, primary_key=True),
+        Column('id', id_type if id_type is not None else BigInteger()),
+        Column('open', price),
+        Column('high', price),
+        Column('low', price),
+        Column('close', price),
+        Column('volume', BigInteger),
+        *extra_columns,
+        Index(f'ix_{table_name}_date', 'date'),
+    )
+
 Base = declarative_base()
 
 class StockData(Base):
-    __tablename__ = 'stock_data'
-    id = Column(Integer, primary_key=True)
-    date = Column(Date)
-    open = Column(Float)
-    high = Column(Float)
-    low = Column(Float)
-    close = Column(Float)
-    volume = Column(Integer)
+    __table__ = stock_table('stock_data', Base.metadata)
+
+def create_stock_table(engine, data, table_name='stock_data', float32=False):
+    """
+    Creates a stock table for the columns of `data` if it does not exist yet. The core
+    columns follow stock_table; any other column of the frame is added with a compact
+    type inferred from its dtype.
+
+    Parameters:
+    - engine (sqlalchemy.engine.Engine): Target database.
+    - data (pandas.DataFrame): Frame whose columns the table must hold.
+    - table_name (str): Name of the table.
+    - float32 (bool): Store float columns as 4-byte floats.
+
+    Returns:
+    - sqlalchemy.Table: The table definition.
+    """
+    core = {'symbol', 'date', 'id', 'open', 'high', 'low', 'close', 'volume'}
+    id_type = None
+    if 'id' in data.columns and not pd.api.types.is_integer_dtype(data['id']):
+        id_type = String(36) # uuid ids
+    extra_columns = [Column(c, _column_type(data[c].dtype, float32)) for c in data.columns if c not in core]
+    table = stock_table(table_name, MetaData(), float32=float32, id_type=id_type, extra_columns=extra_columns)
+    table.create(engine, checkfirst=True)
+    return table
+
+def _stock_dates(data):
+    """
+    Turns a datetime64 'date' column of a stock frame into dates, which is what the Date
+    key column holds: written as timestamps, the rows would neither load back nor match
+    on a later upsert.
+    """
+    if set(STOCK_KEY_COLUMNS) <= set(data.columns) and pd.api.types.is_datetime64_any_dtype(data['date']):
+        data = data.assign(date=data['date'].dt.date)
+    return data
+
+def partition_table_name(table_name, partition_by, key):
+    """
+    Name of the table holding one partition, e.g. stock_data__aapl or stock_data__2020.
+    Characters other than letters and digits are escaped as _ and their hex code
+    (BRK.B -> stock_data__brk_2eb, BRK-B -> stock_data__brk_2db), so distinct keys
+    never share a table; keys differing only in case do (see _partition).
+
+    Parameters:
+    - table_name (str): Base table name.
+    - partition_by (str): None, 'symbol' or 'year'.
+    - key: The partition value (symbol or year).
+
+    Returns:
+    - str: The partition's table name.
+    """
+    if partition_by not in PARTITION_STRATEGIES:
+        raise ValueError(f"Unknown partition_by '{partition_by}', expected one of {PARTITION_STRATEGIES}")
+    if partition_by is None:
+        return table_name
+    escaped = re.sub(r'[^a-z0-9]', lambda match: f"_{ord(match.group()):02x}", str(key).lower())
+    return f"{table_name}__{escaped}"
+
+def _partition(data, table_name, partition_by):
+    """Splits a frame into (table name, rows) pairs according to the partition strategy."""
+    if partition_by is None:
+        return [(table_name, data)]
+    if partition_by == 'symbol':
+        keys = data['symbol']
+    elif partition_by == 'year':
+        keys = pd.to_datetime(data['date']).dt.year
+    else:
+        raise ValueError(f"Unknown partition_by '{partition_by}', expected one of {PARTITION_STRATEGIES}")
+    parts = [(partition_table_name(table_name, partition_by, key), key, part) for key, part in data.groupby(keys, sort=True)]
+    # Table names are lower case: keys differing only in case would be written to the same table
+    names = {}
+    for name, key, _ in parts:
+        if name in names:
+            raise ValueError(f"Partition keys {names[name]!r} and {key!r} both map to table {name}")
+        names[name] = key
+    return [(name, part) for name, _, part in parts]
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+def get_engine(database_url):
+    """
+    Returns the engine for a database URL, creating it on first use. Engines keep a
+    connection pool, so reusing one avoids reconnecting on every save.
+
+    Parameters:
+    - database_url (str): The database URL.
+
+    Returns:
+    - sqlalchemy.engine.Engine: The shared engine for this URL.
+    """
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(database_url)
+        if engine is None:
+            engine = create_engine(database_url)
+            _ENGINES[database_url] = engine
+        return engine
+
+def dispose_engines():
+    """
+    Closes the pooled connections of every cached engine and forgets them.
+    """
+    with _ENGINES_LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
 
-def save_data_to_db(data, database_url, table_name='stock_data'):
+def _log_throughput(action, rows, table_name, start_time):
+    elapsed = time.perf_counter() - start_time
+    logger.info("%s %d rows into %s in %.2fs (%.0f rows/s)", action, rows, table_name,
+                elapsed, rows / elapsed if elapsed > 0 else float('inf'))
+
+def _ensure_table(engine, data, table_name, float32=False):
+    """
+    Creates the table on first write: from the stock schema when the frame has the
+    (symbol, date) key, otherwise from the schema pandas infers.
+    """
+    if set(STOCK_KEY_COLUMNS) <= set(data.columns):
+        create_stock_table(engine, data, table_name, float32=float32)
+    elif not inspect(engine).has_table(table_name):
+        data.head(0).to_sql(name=table_name, con=engine, index=False)
+
+def _ensure_upsert_table(engine, data, table_name, key_columns, float32=False):
+    """
+    Creates the table if needed and makes sure a unique index over the key columns
+    exists so conflicts can be detected.
+    """
+    _ensure_table(engine, data, table_name, float32=float32)
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    if sorted(table.primary_key.columns.keys()) != sorted(key_columns):
+        index = Index(f"ux_{table_name}_{'_'.join(key_columns)}", *[table.c[c] for c in key_columns], unique=True)
+        index.create(engine, checkfirst=True)
+    return table
+
+def _upsert_sql(engine, table, columns, key_columns):
+    """
+    INSERT ... ON CONFLICT DO UPDATE statement in the driver's own parameter style, so that
+    rows can be handed to the DBAPI cursor as plain tuples. On psycopg2 the VALUES clause is
+    a single %s for execute_values.
+    """
+    quote = engine.dialect.identifier_preparer.quote
+    names = ', '.join(quote(c) for c in columns)
+    if engine.dialect.driver == 'psycopg2':
+        values = '%s'
+    else:
+        placeholder = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}.get(engine.dialect.paramstyle)
+        if placeholder is None:
+            raise ValueError(f"Unsupported DBAPI parameter style '{engine.dialect.paramstyle}'")
+        values = f"({', '.join([placeholder] * len(columns))})"
+    updates = ', '.join(f"{quote(c)} = excluded.{quote(c)}" for c in columns if c not in key_columns)
+    conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    return (f"INSERT INTO {quote(table.name)} ({names}) VALUES {values} "
+            f"ON CONFLICT ({', '.join(quote(c) for c in key_columns)}) {conflict}")
+
+def _row_tuples(chunk, table, dialect):
+    """
+    Rows of `chunk` as DBAPI parameter tuples: NaN -> NULL, numpy scalars -> python objects,
+    and the values of typed columns (e.g. dates) converted the way SQLAlchemy would bind them.
+    """
+    columns = []
+    for name in chunk.columns:
+        values = chunk[name].astype(object).where(chunk[name].notna(), None).tolist()
+        process = table.c[name].type.bind_processor(dialect)
+        if process is not None:
+            values = [process(value) for value in values]
+        columns.append(values)
+    return list(zip(*columns))
+
+def upsert_data_to_db(data, database_url, table_name='stock_data', key_columns=STOCK_KEY_COLUMNS, chunksize=10000,
+                      partition_by=None, float32=False):
+    """
+    Inserts or updates rows in bulk, keyed on `key_columns`, using the dialect's native
+    INSERT ... ON CONFLICT DO UPDATE (SQLite and PostgreSQL). Rows are sent in chunks of
+    tuples straight to the driver (executemany, or execute_values on psycopg2), so
+    re-running the pipeline never duplicates rows.
+
+    Parameters:
+    - data (pandas.DataFrame): The data to save. Assumes column names are already in lowercase.
+    - database_url (str): The database URL.
+    - table_name (str): The table name where data should be saved.
+    - key_columns (tuple): Columns identifying a row, e.g. ('symbol', 'date').
+    - chunksize (int): Number of rows sent per executemany batch.
+    - partition_by (str, optional): Split rows into one table per 'symbol' or per 'year'.
+    - float32 (bool): Store float columns as 4-byte floats when the table is created.
+
+    Returns:
+    - int: The number of rows written.
+    """
+    engine = get_engine(database_url)
+    if engine.dialect.name not in ('sqlite', 'postgresql'):
+        raise ValueError(f"Upserts are not supported for the '{engine.dialect.name}' dialect")
+
+    data = _stock_dates(data)
+    start_time = time.perf_counter()
+    for part_name, part in _partition(data, table_name, partition_by):
+        table = _ensure_upsert_table(engine, part, part_name, key_columns, float32=float32)
+
+        columns = [c for c in part.columns if c in table.c]
+        sql = _upsert_sql(engine, table, columns, key_columns)
+
+        with engine.begin() as conn:
+            cursor = conn.connection.cursor()
+            try:
+                for offset in range(0, len(part), chunksize):
+                    rows = _row_tuples(part[columns].iloc[offset:offset + chunksize], table, engine.dialect)
+                    if engine.dialect.driver == 'psycopg2':
+                        from psycopg2.extras import execute_values
+                        execute_values(cursor, sql, rows, page_size=chunksize)
+                    else:
+                        cursor.executemany(sql, rows)
+            finally:
+                cursor.close()
+
+    _log_throughput("Upserted", len(data), table_name, start_time)
+    return len(data)
+
+def save_data_to_db(data, database_url, table_name='stock_data', upsert=False,
+                    key_columns=STOCK_KEY_COLUMNS, chunksize=10000, partition_by=None, float32=False):
     """
     Saves the provided DataFrame to a database table using pandas' to_sql method,
     which automatically handles column names and data types.
@@ -28,13 +294,36 @@ def save_data_to_db(data, database_url, table_name='stock_data'):
     - data (pandas.DataFrame): The data to save. Assumes column names are already in lowercase.
     - database_url (str): The database URL.
     - table_name (str): The table name where data should be saved.
+    - upsert (bool): Update rows whose `key_columns` already exist instead of appending duplicates.
+    - key_columns (tuple): Columns identifying a row when upserting.
+    - chunksize (int): Number of rows written per batch.
+    - partition_by (str, optional): Split rows into one table per 'symbol' or per 'year'
+      (see partition_table_name) so range reads for one ticker or year touch a small table.
+    - float32 (bool): Store float columns as 4-byte floats when the table is created.
+
+    Frames with 'symbol' and 'date' columns are written to a table created from the
+    stock_table schema; other frames get the schema pandas infers. The stock table has a
+    (symbol, date) primary key, so appending rows that are already stored raises an
+    IntegrityError instead of duplicating them: pass upsert=True to re-run a load.
     """
-    engine = create_engine(database_url)
+    engine = get_engine(database_url)
     # Convert UUIDs to strings if not already done
     if 'id' in data.columns and isinstance(data['id'].iloc[0], uuid.UUID):
         data['id'] = data['id'].apply(lambda x: str(x))
+
+    if upsert:
+        return upsert_data_to_db(data, database_url, table_name, key_columns=key_columns, chunksize=chunksize,
+                                 partition_by=partition_by, float32=float32)
+
     # Use the DataFrame's to_sql method to save data to the database
-    data.to_sql(name=table_name, con=engine, index=False, if_exists='append')
+    data = _stock_dates(data)
+    start_time = time.perf_counter()
+    for part_name, part in _partition(data, table_name, partition_by):
+        if set(STOCK_KEY_COLUMNS) <= set(part.columns):
+            create_stock_table(engine, part, part_name, float32=float32)
+        part.to_sql(name=part_name, con=engine, index=False, if_exists='append', chunksize=chunksize)
+    _log_throughput("Appended", len(data), table_name, start_time)
+    return len(data)
 
 def save_data_to_csv(data, filename):
     """
@@ -46,6 +335,32 @@ def save_data_to_csv(data, filename):
     """
     data.to_csv(filename, index=False)
 
+def save_data_to_parquet(data, path, partition_by=('symbol',), compression='zstd', append=True):
+    """
+    Saves the provided DataFrame to a compressed, hive-partitioned Parquet dataset
+    (e.g. path/symbol=AAPL/part-....parquet). Unlike CSV this keeps dtypes,
+    and load_stock_data can read a symbol/date range back without touching other partitions.
+
+    Parameters:
+    - data (pandas.DataFrame): The data to save. Assumes column names are already in lowercase.
+    - path (str): Root directory of the dataset.
+    - partition_by (tuple): Partition columns, e.g. ('symbol',) or ('symbol', 'year'); 'year' is derived from
+      the 'date' column. Keep partitions large: daily bars split by symbol and year give ~250-row files.
+    - compression (str): Parquet codec, e.g. 'zstd', 'snappy' or 'none'.
+    - append (bool): Add new files next to the existing ones, otherwise replace the whole dataset.
+    """
+    partition_by = list(partition_by or [])
+    if 'year' in partition_by and 'year' not in data.columns:
+        data = data.assign(year=pd.to_datetime(data['date']).dt.year)
+    if not append and os.path.exists(path):
+        shutil.rmtree(path)
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    # A unique file name per write lets repeated calls append instead of overwriting each other
+    pq.write_to_dataset(table, root_path=path, partition_cols=partition_by or None, compression=compression,
+                        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                        existing_data_behavior='overwrite_or_ignore')
+
 # Example usage
 if __name__ == "__main__":
     data = pd.DataFrame({
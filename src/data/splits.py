@@ -0,0 +1,74 @@
+# src/data/splits.py
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+"""
+IMPORTANT DATA TIP: WE ENFORCE LOWER CASE FOR PANDA HEADERS!!! 😠
+
+Walk-forward (rolling-origin) splits. Folds are cut on sessions (distinct dates), not
+rows, so every symbol of a panel shares the same train/test dates, and each fold is
+returned as row positions rather than as copied frames: hundreds of folds cost a few
+integers each.
+"""
+
+Fold = namedtuple('Fold', ['train', 'test'])
+
+def walk_forward_splits(data, test_size, train_size, step=None, gap=0, expanding=True, date_column='date'):
+    """
+    Generates walk-forward train/test folds.
+
+    Rows already in date order (e.g. after prepare_data's sort) give slices, so data.iloc[fold.train]
+    or array[fold.train] are views. Other orders (e.g. symbol then date) give position arrays that are
+    views of one argsort, to use with iloc/take.
+
+    Parameters:
+    - data (pandas.DataFrame or array-like): Frame with a date column, or the dates themselves.
+    - test_size (int): Sessions per test window.
+    - train_size (int): Sessions of the first training window (expanding) or of every training window (rolling).
+    - step (int, optional): Sessions the origin moves forward between folds, `test_size` by default.
+    - gap (int): Embargo sessions left out between the end of training and the start of testing,
+      e.g. the label horizon, so that no training label overlaps the test window.
+    - expanding (bool): Training windows start at the first session (expanding) or keep `train_size` (rolling).
+    - date_column (str): Date column of `data`.
+
+    Returns:
+    - generator: Fold(train, test) tuples; only complete test windows are generated.
+    """
+    step = step or test_size
+    if min(test_size, train_size, step) < 1 or gap < 0:
+        raise ValueError("test_size, train_size and step must be positive and gap non-negative")
+
+    dates = data[date_column] if isinstance(data, pd.DataFrame) else data
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+    order = None
+    if (dates[1:] < dates[:-1]).any():
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+
+    # Row position where every session starts, plus the end of the last one
+    _, session_starts = np.unique(dates, return_index=True)
+    bounds = np.r_[session_starts, len(dates)]
+    n_sessions = len(session_starts)
+
+    def rows(first, last):
+        if order is None:
+            return slice(int(bounds[first]), int(bounds[last]))
+        return order[bounds[first]:bounds[last]]
+
+    return _folds(rows, n_sessions, test_size, train_size, step, gap, expanding)
+
+def _folds(rows, n_sessions, test_size, train_size, step, gap, expanding):
+    test_start = train_size + gap
+    while test_start + test_size <= n_sessions:
+        train_end = test_start - gap
+        train_start = 0 if expanding else train_end - train_size
+        yield Fold(rows(train_start, train_end), rows(test_start, test_start + test_size))
+        test_start += step
+
+def n_walk_forward_splits(n_sessions, test_size, train_size, step=None, gap=0):
+    """Number of folds walk_forward_splits generates over `n_sessions` sessions."""
+    step = step or test_size
+    available = n_sessions - train_size - gap - test_size
+    return available // step + 1 if available >= 0 else 0
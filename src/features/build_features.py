@@ -4,8 +4,117 @@ import os
 
 """
 IMPORTANT DATA TIP: WE ENFORCE LOWER CASE FOR PANDA HEADERS!!! 😠
+
+Every feature works on one symbol per frame as well as on long-format panels
+(a 'symbol' column, rows of each symbol in date order): windows never cross symbols.
 """
 
+def _symbol_panel(data):
+    """
+    Describes the symbol layout of a multi-symbol frame, None for single-symbol frames.
+
+    Returns:
+    - tuple: (order, positions) where `order` sorts the rows so that every symbol is one
+      contiguous block (None if they already are) and `positions` is each sorted row's
+      position within its symbol's block.
+    """
+    if 'symbol' not in data.columns:
+        return None
+    codes, uniques = pd.factorize(data['symbol'])
+    if len(uniques) < 2:
+        return None
+    order = None
+    if (np.diff(codes) < 0).any():
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    positions = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    return order, positions
+
+def _apply_panel(series, panel, func, valid_from):
+    """
+    Runs a whole-column pandas operation once over all symbols, then blanks the rows
+    whose window reaches back into the previous symbol (position < valid_from).
+    """
+    if panel is None:
+        return func(series)
+    order, positions = panel
+    values = series.to_numpy() if order is None else series.to_numpy()[order]
+    result = func(pd.Series(values)).to_numpy(copy=True)
+    result[positions < valid_from] = np.nan
+    if order is not None:
+        unsorted = np.empty_like(result)
+        unsorted[order] = result
+        result = unsorted
+    return pd.Series(result, index=series.index)
+
+def _rolling(series, window, panel=None, stat='mean'):
+    """Rolling statistic of a series, computed separately for each symbol of a panel."""
+    if stat in ('std', 'var'):
+        # pandas slides the variance by updating running moments: over a whole column, the rounding
+        # residue of one symbol's prices carries into the next symbol's windows (a penny stock after
+        # a $500k stock gets a std of 0), so these restart at every symbol
+        return _apply_grouped(series, panel, lambda s: getattr(s.rolling(window=window), stat)())
+    return _apply_panel(series, panel, lambda s: getattr(s.rolling(window=window), stat)(), window - 1)
+
+def _diff(series, panel=None):
+    """First difference of a series, restarting at every symbol."""
+    return _apply_panel(series, panel, lambda s: s.diff(1), 1)
+
+def _shift(series, panel=None):
+    """Previous row of a series, NaN on the first row of every symbol."""
+    return _apply_panel(series, panel, lambda s: s.shift(1), 1)
+
+def _apply_grouped(series, panel, func):
+    """
+    Runs a pandas operation that carries state over all previous rows (ewm, cumsum) on
+    each symbol separately, in one grouped pass: func receives a SeriesGroupBy (or the
+    Series itself for single-symbol frames).
+    """
+    if panel is None:
+        return func(series)
+    order, positions = panel
+    values = series.to_numpy() if order is None else series.to_numpy()[order]
+    groups = np.cumsum(positions == 0)
+    result = func(pd.Series(values).groupby(groups, sort=False))
+    if isinstance(result.index, pd.MultiIndex):
+        result = result.droplevel(0)
+    result = result.to_numpy()
+    if order is not None:
+        unsorted = np.empty_like(result)
+        unsorted[order] = result
+        result = unsorted
+    return pd.Series(result, index=series.index)
+
+def _ewm_mean(series, alpha, panel=None):
+    """
+    Exponentially weighted mean in its recursive form (pandas' adjust=False), restarting
+    at every symbol.
+    """
+    if panel is None or series.isna().any():
+        return _apply_grouped(series, panel, lambda s: s.ewm(alpha=alpha, adjust=False).mean())
+
+    # One pass over the whole column, then remove what leaked in from the previous symbol:
+    # the recursion is linear, so at a symbol's start the leak is (1 - alpha) * (previous
+    # mean - first value) and it decays by (1 - alpha) every row after that
+    order, positions = panel
+    x = series.to_numpy(dtype=np.float64)
+    if order is not None:
+        x = x[order]
+    mean = pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    starts = np.flatnonzero(positions == 0)
+    leak = np.zeros(len(starts))
+    leak[1:] = (1 - alpha) * (mean[starts[1:] - 1] - x[starts[1:]])
+    result = mean - np.repeat(leak, np.diff(np.r_[starts, len(x)])) * (1 - alpha) ** positions
+    if order is not None:
+        unsorted = np.empty_like(result)
+        unsorted[order] = result
+        result = unsorted
+    return pd.Series(result, index=series.index)
+
+def _cumsum(series, panel=None):
+    """Cumulative sum, restarting at every symbol."""
+    return _apply_grouped(series, panel, lambda s: s.cumsum())
 
 def add_moving_averages(data, windows=[5, 20, 50]):
     """
@@ -20,8 +129,9 @@ def add_moving_averages(data, windows=[5, 20, 50]):
 
     # TODO, may be adding NaNs here
     """
+    panel = _symbol_panel(data)
     for window in windows:
-        data[f'ma_{window}'] = data['close'].rolling(window=window).mean()
+        data[f'ma_{window}'] = _rolling(data['close'], window, panel)
     return data
 
 def add_rsi(data, window=14):
@@ -38,9 +148,10 @@ def add_rsi(data, window=14):
     # TODO, may be adding NaNs here
     """
 
-    delta = data['close'].diff(1)
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+    panel = _symbol_panel(data)
+    delta = _diff(data['close'], panel)
+    gain = _rolling(delta.where(delta > 0, 0), window, panel)
+    loss = _rolling(-delta.where(delta < 0, 0), window, panel)
 
     rs = gain / loss
     data['rsi'] = 100 - (100 / (1 + rs))
@@ -58,20 +169,246 @@ def add_bollinger_bands(data, window=20):
     Returns:
     - pandas.DataFrame: DataFrame with new columns 'bb_high' and 'bb_low'.
     """
-    ma = data['close'].rolling(window=window).mean()
-    std = data['close'].rolling(window=window).std()
+    panel = _symbol_panel(data)
+    ma = _rolling(data['close'], window, panel)
+    std = _rolling(data['close'], window, panel, stat='std')
     
     data['bb_high'] = ma + (std * 2)
     data['bb_low'] = ma - (std * 2)
     
     return data
 
-def build_features(data):
+def add_ema(data, spans=[12, 26]):
+    """
+    Adds exponential moving averages of the close.
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame containing stock price data.
+    - spans (list): EMA spans (smoothing factor 2 / (span + 1)).
+
+    Returns:
+    - pandas.DataFrame: DataFrame with new columns 'ema_{span}'.
+    """
+    panel = _symbol_panel(data)
+    for span in spans:
+        data[f'ema_{span}'] = _ewm_mean(data['close'], 2 / (span + 1), panel)
+    return data
+
+def add_macd(data, fast=12, slow=26, signal=9):
+    """
+    Adds the Moving Average Convergence Divergence.
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame containing stock price data.
+    - fast (int): Span of the fast EMA.
+    - slow (int): Span of the slow EMA.
+    - signal (int): Span of the signal line (EMA of the MACD).
+
+    Returns:
+    - pandas.DataFrame: DataFrame with new columns 'macd', 'macd_signal' and 'macd_hist'.
+    """
+    panel = _symbol_panel(data)
+    macd = _ewm_mean(data['close'], 2 / (fast + 1), panel) - _ewm_mean(data['close'], 2 / (slow + 1), panel)
+    data['macd'] = macd
+    data['macd_signal'] = _ewm_mean(macd, 2 / (signal + 1), panel)
+    data['macd_hist'] = macd - data['macd_signal']
+    return data
+
+def add_atr(data, window=14):
+    """
+    Adds the Average True Range (Wilder's smoothing of the true range).
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame with 'high', 'low' and 'close' columns.
+    - window (int): ATR window.
+
+    Returns:
+    - pandas.DataFrame: DataFrame with a new column 'atr'.
+    """
+    panel = _symbol_panel(data)
+    high, low = data['high'].to_numpy(dtype=np.float64), data['low'].to_numpy(dtype=np.float64)
+    previous_close = _shift(data['close'], panel).to_numpy()
+    # On the first row of a symbol there is no previous close, fmax then keeps high - low
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    data['atr'] = _ewm_mean(pd.Series(true_range, index=data.index), 1 / window, panel)
+    return data
+
+def add_obv(data):
+    """
+    Adds the On-Balance Volume: the running sum of the volume, signed by the close's direction.
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame with 'close' and 'volume' columns.
+
+    Returns:
+    - pandas.DataFrame: DataFrame with a new column 'obv'.
+    """
+    panel = _symbol_panel(data)
+    direction = np.sign(_diff(data['close'], panel).fillna(0))
+    data['obv'] = _cumsum(direction * data['volume'], panel)
+    return data
+
+def add_vwap(data, window=20):
+    """
+    Adds the rolling Volume Weighted Average Price of the typical price (high + low + close) / 3.
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame with 'high', 'low', 'close' and 'volume' columns.
+    - window (int): Number of bars averaged over.
+
+    Returns:
+    - pandas.DataFrame: DataFrame with a new column 'vwap'.
+    """
+    panel = _symbol_panel(data)
+    typical = (data['high'] + data['low'] + data['close']) / 3
+    volume = data['volume'].astype(np.float64)
+    traded = _rolling(typical * volume, window, panel, stat='sum')
+    data['vwap'] = traded / _rolling(volume, window, panel, stat='sum')
+    return data
+
+def add_stochastic(data, window=14, smooth=3):
+    """
+    Adds the stochastic oscillator.
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame with 'high', 'low' and 'close' columns.
+    - window (int): Lookback of the highest high and lowest low.
+    - smooth (int): Moving average window of %D.
+
+    Returns:
+    - pandas.DataFrame: DataFrame with new columns 'stoch_k' (%K) and 'stoch_d' (%D).
+    """
+    panel = _symbol_panel(data)
+    lowest = _rolling(data['low'], window, panel, stat='min')
+    highest = _rolling(data['high'], window, panel, stat='max')
+    data['stoch_k'] = 100 * (data['close'] - lowest) / (highest - lowest)
+    data['stoch_d'] = _rolling(data['stoch_k'], smooth, panel)
+    return data
+
+def add_zscore(data, window=20, column='close'):
+    """
+    Adds the rolling z-score of a column: its distance to the rolling mean in rolling standard deviations.
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame containing stock price data.
+    - window (int): Rolling window.
+    - column (str): Column to standardize.
+
+    Returns:
+    - pandas.DataFrame: DataFrame with a new column 'zscore_{window}'.
+    """
+    panel = _symbol_panel(data)
+    mean = _rolling(data[column], window, panel)
+    std = _rolling(data[column], window, panel, stat='std')
+    data[f'zscore_{window}'] = (data[column] - mean) / std
+    return data
+
+def add_log_returns(data):
+    """
+    Adds the log return of the close, log(close_t / close_t-1).
+
+    Parameters:
+    - data (pandas.DataFrame): DataFrame containing stock price data.
+
+    Returns:
+    - pandas.DataFrame: DataFrame with a new column 'log_return'.
+    """
+    panel = _symbol_panel(data)
+    data['log_return'] = _diff(np.log(data['close']), panel)
+    return data
+
+def _block_cumsum(columns, positions):
+    """
+    Cumulative sums of (n, k) columns restarting at every symbol's block (position 0), so
+    a symbol's sums never carry the magnitude, and the rounding, of the symbols before it.
+    """
+    if positions[1:].all():
+        return np.cumsum(columns, axis=0)
+    blocks = np.cumsum(positions == 0)
+    return pd.DataFrame(columns).groupby(blocks, sort=False).cumsum().to_numpy()
+
+def _window_sums(cumsum, window, positions):
+    """
+    Sums over trailing windows from a cumulative sum restarting at every symbol (see
+    _block_cumsum), NaN where the window is not full yet (position < window - 1).
+    """
+    sums = cumsum.copy()
+    # The sum of rows before the window, 0 when the window starts a symbol's block
+    sums[window:] -= np.where(positions[window:] >= window, cumsum[:-window], 0.0)
+    sums[positions < window - 1] = np.nan
+    return sums
+
+def fused_rolling_features(close, ma_windows=(5, 20, 50), rsi_window=14, bb_window=20, panel=None):
+    """
+    Computes every moving average, the Bollinger bands and the RSI gain/loss averages
+    from shared cumulative sums, instead of one pandas rolling pass (and temporary
+    Series) per statistic. Identical windows (the 20-day mean of the MA and the bands)
+    are computed once. The sums restart at every symbol and are taken over prices
+    centered on the symbol's first price, so each symbol only accumulates the rounding
+    of its own history: the Bollinger std stays within ~1e-6 relative error of pandas
+    over 5000 bars, whatever the price scale of the other symbols.
+
+    Parameters:
+    - close (pandas.Series): Close prices, each symbol's rows contiguous and in date order.
+    - ma_windows (list): Moving average windows.
+    - rsi_window (int): RSI window.
+    - bb_window (int): Bollinger bands window.
+    - panel (tuple, optional): Symbol layout from _symbol_panel for multi-symbol series.
+
+    Returns:
+    - dict: Column name -> numpy array, for 'ma_{window}', 'rsi', 'bb_high' and 'bb_low'.
+    """
+    x = close.to_numpy(dtype=np.float64)
+    n = len(x)
+    positions = np.arange(n) if panel is None else panel[1]
+    block_start = np.arange(n) - positions
+
+    # Center each symbol on its first price so the sum of squares does not lose precision
+    reference = np.nan_to_num(x[block_start]) if n else x
+    centered = x - reference
+    valid = ~np.isnan(centered)
+    centered = np.where(valid, centered, 0.0)
+
+    # RSI: like add_rsi, a missing delta (first row of a symbol, NaN price) counts as no gain and no loss
+    delta = np.zeros(n)
+    delta[1:] = x[1:] - x[:-1]
+    delta[positions == 0] = 0.0
+    delta = np.nan_to_num(delta)
+
+    sums = _block_cumsum(np.column_stack([centered, centered * centered, valid, np.maximum(delta, 0.0),
+                                          np.maximum(-delta, 0.0)]), positions)
+    sum_x, sum_xx, count, gain, loss = sums.T
+
+    features = {}
+    has_missing = not valid.all()
+    for window in sorted(set(ma_windows) | {bb_window}):
+        window_sums = _window_sums(sum_x, window, positions)
+        if has_missing:
+            # pandas' rolling default: NaN unless the whole window holds valid prices
+            window_sums[_window_sums(count, window, positions) != window] = np.nan
+        mean = window_sums / window
+        if window in ma_windows:
+            features[f'ma_{window}'] = mean + reference
+        if window == bb_window:
+            squares = _window_sums(sum_xx, window, positions)
+            std = np.sqrt(np.maximum((squares - window_sums * mean) / (window - 1), 0.0))
+            features['bb_high'] = mean + reference + std * 2
+            features['bb_low'] = mean + reference - std * 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = _window_sums(gain, rsi_window, positions) / _window_sums(loss, rsi_window, positions)
+        features['rsi'] = 100 - (100 / (1 + rs))
+    return features
+
+def build_features(data, method='pandas'):
     """
     Applies various feature engineering techniques to the stock price data.
     
     Parameters:
-    - data (pandas.DataFrame): DataFrame containing stock price data.
+    - data (pandas.DataFrame): DataFrame containing stock price data, one symbol or a
+      long-format panel with a 'symbol' column (each symbol's rows in date order).
+    - method (str): 'pandas' for one rolling pass per indicator, 'fused' for the single-pass
+      cumulative-sum kernel (fused_rolling_features), faster on long histories.
     
     Returns:
     - pandas.DataFrame: Enhanced DataFrame with additional features.
@@ -81,15 +418,33 @@ def build_features(data):
     # Adjust this value based on the actual largest window size you use in your feature engineering
     MIN_REQUIRED_LENGTH = 50
 
-    # Check if the data length is sufficient, skip if in test
-    if not os.getenv('RUNNING_TESTS') and len(data) < MIN_REQUIRED_LENGTH:
+    # Check if the data length is sufficient (for every symbol of a panel), skip if in test
+    panel = _symbol_panel(data)
+    length = len(data) if panel is None else (panel[1][np.r_[panel[1][1:] == 0, True]] + 1).min()
+    if not os.getenv('RUNNING_TESTS') and length < MIN_REQUIRED_LENGTH:
         raise ValueError(f"Data length is insufficient for feature engineering. " \
-                         f"Required: {MIN_REQUIRED_LENGTH}, Provided: {len(data)}")
+                         f"Required: {MIN_REQUIRED_LENGTH}, Provided: {length}")
     
 
-    data = add_moving_averages(data)
-    data = add_rsi(data)
-    data = add_bollinger_bands(data)
+    # Group interleaved panels (e.g. sorted by date) into per-symbol blocks once, up front
+    order = panel[0] if panel is not None else None
+    if order is not None:
+        data = data.iloc[order].copy()
+
+    if method == 'pandas':
+        data = add_moving_averages(data)
+        data = add_rsi(data)
+        data = add_bollinger_bands(data)
+    elif method == 'fused':
+        # Rows are grouped by symbol at this point, only the positions are still needed
+        features = fused_rolling_features(data['close'], panel=None if panel is None else (None, panel[1]))
+        for column in ['ma_5', 'ma_20', 'ma_50', 'rsi', 'bb_high', 'bb_low']:
+            data[column] = features[column]
+    else:
+        raise ValueError(f"Unknown method '{method}', expected 'pandas' or 'fused'")
+
+    if order is not None:
+        data = data.iloc[np.argsort(order)]
     
     # Add more feature engineering functions as needed
     
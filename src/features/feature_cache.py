@@ -0,0 +1,160 @@
+# src/features/feature_cache.py
+
+import os
+import json
+import time
+import hashlib
+import logging
+import pandas as pd
+from src.features.build_features import build_features
+
+"""
+Content-addressed cache of build_features outputs.
+
+An entry is keyed on a hash of the columns build_features reads ('symbol', 'close') and
+of the feature configuration, so a change to either is a miss. Only the feature columns
+are stored (one Parquet file per entry, rows in the order of the input frame); the
+other columns come from the frame passed in.
+
+When a single-symbol frame extends a cached one (new bars appended), only the tail is
+recomputed, from enough lookback rows to fill the longest window.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Bump when the feature code changes so that stale entries stop matching
+CACHE_VERSION = 1
+
+INDEX_FILE = 'index.json'
+INPUT_COLUMNS = ['symbol', 'close']
+
+class FeatureCache:
+    """
+    On-disk feature cache with least-recently-used eviction once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, cache_dir, max_bytes=None, lookback=64):
+        """
+        Parameters:
+        - cache_dir (str): Directory holding the cached files, created if missing.
+        - max_bytes (int, optional): Size budget of the cached files, None for unbounded.
+        - lookback (int): Rows before the first new bar recomputed along with the tail,
+          at least the longest feature window.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lookback = lookback
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.parquet')
+
+    def _read_index(self):
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            index = json.load(f)
+        # Entries whose file went missing are simply misses
+        return {k: v for k, v in index.items() if os.path.exists(self._path(k))}
+
+    def _write_index(self, index):
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _config_digest(config):
+        config = dict(config, version=CACHE_VERSION)
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def _row_hashes(data):
+        columns = [c for c in INPUT_COLUMNS if c in data.columns]
+        return pd.util.hash_pandas_object(data[columns], index=False).to_numpy()
+
+    @staticmethod
+    def _key(row_hashes, config_digest):
+        return hashlib.sha256(config_digest.encode() + row_hashes.tobytes()).hexdigest()
+
+    def _find_prefix(self, index, row_hashes, config_digest):
+        """Longest cached entry whose input rows are the first rows of this frame."""
+        candidates = sorted((entry['n_rows'], key) for key, entry in index.items()
+                            if entry['config'] == config_digest and entry['single_symbol']
+                            and 0 < entry['n_rows'] < len(row_hashes))
+        for n_rows, key in reversed(candidates):
+            if self._key(row_hashes[:n_rows], config_digest) == key:
+                return key, n_rows
+        return None, 0
+
+    def _store(self, index, key, features, config_digest, single_symbol):
+        path = self._path(key)
+        features.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        index[key] = {'n_rows': len(features), 'config': config_digest, 'single_symbol': single_symbol,
+                      'bytes': os.path.getsize(path), 'last_used': time.time()}
+        self._evict(index, keep=key)
+
+    def _evict(self, index, keep):
+        if self.max_bytes is None:
+            return
+        total = sum(entry['bytes'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= index.pop(key)['bytes']
+            os.remove(self._path(key))
+
+    def build_features(self, data, method='pandas'):
+        """
+        Cached equivalent of build_features.
+
+        Parameters:
+        - data (pandas.DataFrame): Same input as build_features.
+        - method (str): Same as build_features.
+
+        Returns:
+        - pandas.DataFrame: The frame with the feature columns added.
+        """
+        config = {'function': 'build_features', 'method': method}
+        config_digest = self._config_digest(config)
+        row_hashes = self._row_hashes(data)
+        key = self._key(row_hashes, config_digest)
+        single_symbol = 'symbol' not in data.columns or data['symbol'].nunique() < 2
+        index = self._read_index()
+
+        if key in index:
+            logger.debug("Feature cache hit %s", key)
+            features = pd.read_parquet(self._path(key))
+            index[key]['last_used'] = time.time()
+        else:
+            # Computed from the input columns alone, so that feature columns already present in
+            # `data` neither leak into the computation nor go missing from the stored entry
+            inputs = data[[c for c in INPUT_COLUMNS if c in data.columns]]
+            prefix_key, n_cached = self._find_prefix(index, row_hashes, config_digest) if single_symbol else (None, 0)
+            if prefix_key is not None:
+                logger.debug("Feature cache prefix hit %s, recomputing %d rows", prefix_key, len(data) - n_cached)
+                start = max(n_cached - self.lookback, 0)
+                tail = build_features(inputs.iloc[start:].copy(), method=method)
+                cached = pd.read_parquet(self._path(prefix_key))
+                new_rows = tail[cached.columns].iloc[n_cached - start:]
+                features = pd.concat([cached, new_rows], ignore_index=True)
+                index[prefix_key]['last_used'] = time.time()
+            else:
+                computed = build_features(inputs.copy(), method=method)
+                features = computed.drop(columns=inputs.columns).reset_index(drop=True)
+            self._store(index, key, features, config_digest, single_symbol)
+        self._write_index(index)
+
+        for column in features.columns:
+            data[column] = features[column].to_numpy()
+        return data
+
+    def clear(self):
+        """Removes every cached entry."""
+        for key in self._read_index():
+            os.remove(self._path(key))
+        self._write_index({})
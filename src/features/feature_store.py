@@ -0,0 +1,183 @@
+# src/features/feature_store.py
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+"""
+A minimal on-disk feature store for training windows.
+
+Layout of a store directory:
+- features.f32 : every feature row as contiguous float32, row-major (n_rows, n_features)
+- dates.i64    : the date of every row as datetime64[ns] ticks
+- index.json   : feature column names, row count and per-symbol (offset, length) blocks
+
+Rows of one symbol are contiguous, so a symbol or a window of it is a plain slice of a
+memory map: nothing is loaded until it is touched, and torch.from_numpy shares the memory.
+"""
+
+FEATURES_FILE = 'features.f32'
+DATES_FILE = 'dates.i64'
+INDEX_FILE = 'index.json'
+
+class FeatureStoreWriter:
+    """
+    Appends per-symbol feature blocks to a store. Writing the same symbol again right
+    after its previous block extends that block, so a symbol can be streamed in chunks.
+    """
+
+    def __init__(self, path, feature_columns, append=False):
+        """
+        Parameters:
+        - path (str): Store directory, created if missing.
+        - feature_columns (list): Columns written for every row, in this order.
+        - append (bool): Keep the rows of an existing store and add to them.
+        """
+        self.path = path
+        self.feature_columns = list(feature_columns)
+        os.makedirs(path, exist_ok=True)
+
+        index_path = os.path.join(path, INDEX_FILE)
+        if append and os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            if index['columns'] != self.feature_columns:
+                raise ValueError(f"Store columns {index['columns']} do not match {self.feature_columns}")
+            self.n_rows = index['n_rows']
+            self.symbols = {s: list(block) for s, block in index['symbols'].items()}
+            mode = 'ab'
+        else:
+            self.n_rows = 0
+            self.symbols = {}
+            mode = 'wb'
+
+        self._features = open(os.path.join(path, FEATURES_FILE), mode)
+        self._dates = open(os.path.join(path, DATES_FILE), mode)
+        # The block at the end of the files is the only one that can still grow
+        self._last_symbol = max(self.symbols, key=lambda s: self.symbols[s][0]) if self.symbols else None
+
+    def write(self, data, symbol):
+        """
+        Appends the rows of one symbol.
+
+        Parameters:
+        - data (pandas.DataFrame): Date-ordered rows with a 'date' column and the feature columns.
+        - symbol (str): The symbol these rows belong to.
+        """
+        if symbol in self.symbols and symbol != self._last_symbol:
+            raise ValueError(f"Rows of '{symbol}' must be written contiguously")
+
+        values = np.ascontiguousarray(data[self.feature_columns].to_numpy(dtype=np.float32))
+        dates = pd.to_datetime(data['date']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        self._features.write(values.tobytes())
+        self._dates.write(dates.tobytes())
+
+        if symbol in self.symbols:
+            self.symbols[symbol][1] += len(values)
+        else:
+            self.symbols[symbol] = [self.n_rows, len(values)]
+        self._last_symbol = symbol
+        self.n_rows += len(values)
+
+    def write_frame(self, data, symbol_column='symbol'):
+        """
+        Appends a long-format frame holding several symbols, one block per symbol.
+        """
+        for symbol, group in data.groupby(symbol_column, sort=False):
+            self.write(group, symbol)
+
+    def close(self):
+        """Flushes the data files and writes the index."""
+        self._features.close()
+        self._dates.close()
+        index = {'columns': self.feature_columns, 'n_rows': self.n_rows, 'symbols': self.symbols}
+        with open(os.path.join(self.path, INDEX_FILE), 'w') as f:
+            json.dump(index, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_feature_store(data, path, feature_columns=None, symbol_column='symbol'):
+    """
+    Writes the output of build_features/prepare_data to a feature store.
+
+    Parameters:
+    - data (pandas.DataFrame): Long-format frame with 'symbol' and 'date' columns.
+    - path (str): Store directory (overwritten).
+    - feature_columns (list, optional): Columns to store, all numeric columns except 'id' by default.
+
+    Returns:
+    - FeatureStore: The store, opened for reading.
+    """
+    if feature_columns is None:
+        feature_columns = [c for c in data.select_dtypes(include=[np.number]).columns if c != 'id']
+    with FeatureStoreWriter(path, feature_columns) as writer:
+        writer.write_frame(data, symbol_column)
+    return FeatureStore(path)
+
+class FeatureStore:
+    """
+    Read side of the store: every accessor returns a view into the memory map, not a copy.
+    """
+
+    def __init__(self, path):
+        """
+        Parameters:
+        - path (str): Store directory written by FeatureStoreWriter.
+        """
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.columns = index['columns']
+        self.n_rows = index['n_rows']
+        self._blocks = {s: tuple(block) for s, block in index['symbols'].items()}
+
+        shape = (self.n_rows, len(self.columns))
+        if self.n_rows:
+            # Copy-on-write mapping: writable (as torch.from_numpy requires) but never written back
+            self.features = np.memmap(os.path.join(path, FEATURES_FILE), dtype=np.float32, mode='c', shape=shape)
+            self._dates = np.memmap(os.path.join(path, DATES_FILE), dtype=np.int64, mode='c', shape=(self.n_rows,))
+        else:
+            self.features = np.empty(shape, dtype=np.float32)
+            self._dates = np.empty(0, dtype=np.int64)
+
+    @property
+    def symbols(self):
+        return list(self._blocks)
+
+    def __len__(self):
+        return self.n_rows
+
+    def __contains__(self, symbol):
+        return symbol in self._blocks
+
+    def block(self, symbol):
+        """Returns the (offset, length) of a symbol's rows."""
+        return self._blocks[symbol]
+
+    def array(self, symbol, start=0, length=None):
+        """
+        Returns a (length, n_features) float32 view of a symbol's rows starting at `start`.
+        """
+        offset, n = self._blocks[symbol]
+        stop = n if length is None else min(start + length, n)
+        return self.features[offset + start:offset + stop]
+
+    def dates(self, symbol):
+        """Returns the dates of a symbol's rows as datetime64[ns]."""
+        offset, n = self._blocks[symbol]
+        return self._dates[offset:offset + n].view('datetime64[ns]')
+
+    def tensor(self, symbol, start=0, length=None):
+        """
+        Same as array() but as a torch tensor sharing the mapped memory.
+        """
+        import torch
+        return torch.from_numpy(self.array(symbol, start, length))
+
+    def column_index(self, column):
+        return self.columns.index(column)
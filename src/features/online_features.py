@@ -0,0 +1,182 @@
+# src/features/online_features.py
+
+import math
+import numpy as np
+import pandas as pd
+
+"""
+Streaming version of build_features: each new bar updates a few running statistics
+per symbol in O(1) instead of recomputing the rolling windows over the full history.
+Outputs match build_features (same columns, same NaN warm-up) up to rounding.
+"""
+
+class RollingWindow:
+    """
+    Ring buffer over the last `size` values keeping a running mean and sum of squared
+    deviations (Welford's algorithm, extended to removals). Like pandas' rolling, the
+    statistics are NaN until the window is full and while it holds a NaN.
+    """
+
+    # Re-derive the running stats from the buffer every so often to stop rounding drift
+    RECOMPUTE_EVERY = 10000
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = np.full(size, np.nan)
+        self.pushed = 0
+        self.n = 0        # finite values in the window
+        self.n_nan = 0    # NaN values in the window
+        self.n_zero = 0   # exact zeros, so an all-zero window has an exactly zero mean
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def _remove(self, x):
+        if self.n == 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.n -= 1
+        self.mean = (old_mean * (self.n + 1) - x) / self.n
+        self.m2 -= (x - self.mean) * (x - old_mean)
+
+    def _recompute(self):
+        finite = self.buffer[~np.isnan(self.buffer)]
+        self.n = len(finite)
+        self.mean = float(finite.mean()) if self.n else 0.0
+        self.m2 = float(((finite - self.mean) ** 2).sum()) if self.n else 0.0
+
+    def push(self, value):
+        """Adds a value, evicting the oldest one once the window is full."""
+        slot = self.pushed % self.size
+        if self.pushed >= self.size:
+            old = self.buffer[slot]
+            if math.isnan(old):
+                self.n_nan -= 1
+            else:
+                self.n_zero -= old == 0
+                self._remove(old)
+        self.buffer[slot] = value
+        if math.isnan(value):
+            self.n_nan += 1
+        else:
+            self.n_zero += value == 0
+            self._add(value)
+        self.pushed += 1
+        if self.pushed % self.RECOMPUTE_EVERY == 0:
+            self._recompute()
+
+    @property
+    def ready(self):
+        return self.pushed >= self.size and self.n_nan == 0
+
+    def get_mean(self):
+        if not self.ready:
+            return np.nan
+        return 0.0 if self.n_zero == self.n else self.mean
+
+    def get_std(self):
+        """Sample standard deviation (ddof=1), like pandas' rolling std."""
+        if not self.ready or self.size < 2:
+            return np.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.size - 1))
+
+class _SymbolState:
+    """Running windows of one symbol, one RollingWindow per distinct window length."""
+
+    def __init__(self, price_windows, rsi_window):
+        self.prices = {window: RollingWindow(window) for window in price_windows}
+        self.gains = RollingWindow(rsi_window)
+        self.losses = RollingWindow(rsi_window)
+        self.last_close = np.nan
+
+class OnlineFeatureEngine:
+    """
+    Incremental feature engine keeping per-symbol state, so that a new bar costs O(1).
+    """
+
+    def __init__(self, ma_windows=(5, 20, 50), rsi_window=14, bb_window=20):
+        """
+        Parameters:
+        - ma_windows (list): Moving average windows ('ma_{window}' columns).
+        - rsi_window (int): RSI window ('rsi' column).
+        - bb_window (int): Bollinger bands window ('bb_high' and 'bb_low' columns).
+        """
+        self.ma_windows = list(ma_windows)
+        self.rsi_window = rsi_window
+        self.bb_window = bb_window
+        self.states = {}
+
+    @property
+    def feature_columns(self):
+        return [f'ma_{w}' for w in self.ma_windows] + ['rsi', 'bb_high', 'bb_low']
+
+    def _state(self, symbol):
+        state = self.states.get(symbol)
+        if state is None:
+            # The MA and the bands share the window when their lengths are equal
+            state = _SymbolState(set(self.ma_windows) | {self.bb_window}, self.rsi_window)
+            self.states[symbol] = state
+        return state
+
+    def update(self, bar):
+        """
+        Feeds one new bar and returns its feature row.
+
+        Parameters:
+        - bar (dict or pandas.Series): The bar, with at least 'close' (and 'symbol' for several symbols).
+
+        Returns:
+        - dict: The bar's fields plus the updated feature columns.
+        """
+        close = float(bar['close'])
+        state = self._state(bar.get('symbol'))
+
+        for window in state.prices.values():
+            window.push(close)
+
+        # Same convention as add_rsi: a missing delta counts as no gain and no loss
+        delta = close - state.last_close
+        state.gains.push(delta if delta > 0 else 0.0)
+        state.losses.push(-delta if delta < 0 else 0.0)
+        state.last_close = close
+
+        row = dict(bar)
+        for window in self.ma_windows:
+            row[f'ma_{window}'] = state.prices[window].get_mean()
+
+        gain, loss = state.gains.get_mean(), state.losses.get_mean()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.float64(gain) / np.float64(loss)
+            row['rsi'] = float(100 - (100 / (1 + rs)))
+
+        bands = state.prices[self.bb_window]
+        ma, std = bands.get_mean(), bands.get_std()
+        row['bb_high'] = ma + std * 2
+        row['bb_low'] = ma - std * 2
+        return row
+
+    def update_many(self, bars):
+        """
+        Feeds a batch of new bars (typically one per symbol, in date order).
+
+        Parameters:
+        - bars (pandas.DataFrame): New bars with 'symbol' and 'close' columns.
+
+        Returns:
+        - pandas.DataFrame: The bars with their feature columns, same index.
+        """
+        rows = [self.update(bar) for bar in bars.to_dict('records')]
+        return pd.DataFrame(rows, index=bars.index)
+
+    def reset(self, symbol=None):
+        """Forgets the state of one symbol, or of all symbols."""
+        if symbol is None:
+            self.states.clear()
+        else:
+            self.states.pop(symbol, None)
@@ -0,0 +1,240 @@
+# src/features/registry.py
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.features.build_features import (_symbol_panel, _rolling, _diff, add_ema, add_macd, add_atr, add_obv,
+                                         add_vwap, add_stochastic, add_zscore, add_log_returns)
+
+"""
+IMPORTANT DATA TIP: WE ENFORCE LOWER CASE FOR PANDA HEADERS!!! 😠
+
+Declarative feature registry. Each indicator declares its input columns, parameters and
+output columns; compute_features() plans which indicators a request needs (including
+indicators whose outputs are inputs of others), computes them level by level, runs the
+indicators of a level in parallel, and shares intermediates such as diffs and rolling
+means through a FeatureContext.
+
+Output column names are the ones build_features uses: ma_{window}, rsi, bb_high, bb_low.
+"""
+
+@dataclass(frozen=True)
+class Indicator:
+    name: str
+    func: Callable
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    params: Dict[str, object] = field(default_factory=dict)
+
+    def input_columns(self, params):
+        return [c.format(**params) for c in self.inputs]
+
+    def output_columns(self, params):
+        return [c.format(**params) for c in self.outputs]
+
+INDICATORS = {}
+
+def register_indicator(name, inputs=('close',), outputs=None, **params):
+    """
+    Decorator registering an indicator function.
+
+    The function is called as func(ctx, **params) and must return a dict mapping each
+    output column to a Series. Input and output names may use the parameters as format
+    fields, e.g. outputs=['ma_{window}'].
+
+    Parameters:
+    - name (str): Indicator name.
+    - inputs (list): Columns the indicator reads (raw columns or other indicators' outputs).
+    - outputs (list): Columns the indicator produces, defaults to [name].
+    - **params: Parameters and their default values.
+    """
+    def decorator(func):
+        INDICATORS[name] = Indicator(name, func, tuple(inputs), tuple(outputs or [name]), dict(params))
+        return func
+    return decorator
+
+class FeatureContext:
+    """
+    Shared, thread-safe memo of intermediate results for one compute_features call, so
+    that e.g. the 20-day rolling mean is computed once for ma_20 and the Bollinger bands.
+    """
+
+    def __init__(self, data, panel=None):
+        self.data = data
+        self.panel = panel
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def cached(self, key, compute):
+        """Returns the intermediate stored under `key`, computing it on first use."""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    def series(self, source):
+        """A column of the frame, or a previously cached intermediate."""
+        if source in self._cache:
+            return self._cache[source]
+        return self.data[source]
+
+    def diff(self, source):
+        return self.cached(('diff', source), lambda: _diff(self.series(source), self.panel))
+
+    def rolling_mean(self, source, window):
+        return self.cached(('mean', source, window), lambda: _rolling(self.series(source), window, self.panel))
+
+    def rolling_std(self, source, window):
+        return self.cached(('std', source, window), lambda: _rolling(self.series(source), window, self.panel, stat='std'))
+
+    def frame(self, columns):
+        """A copy of some columns (plus 'symbol') to run one of the add_* functions on."""
+        return self.data[[c for c in ['symbol'] + list(columns) if c in self.data.columns]].copy()
+
+@register_indicator('ma', outputs=['ma_{window}'], window=20)
+def moving_average(ctx, window):
+    return {f'ma_{window}': ctx.rolling_mean('close', window)}
+
+@register_indicator('rsi', window=14)
+def relative_strength_index(ctx, window):
+    delta = ctx.diff('close')
+    ctx.cached('gain', lambda: delta.where(delta > 0, 0))
+    ctx.cached('loss', lambda: -delta.where(delta < 0, 0))
+    rs = ctx.rolling_mean('gain', window) / ctx.rolling_mean('loss', window)
+    return {'rsi': 100 - (100 / (1 + rs))}
+
+@register_indicator('bb', outputs=['bb_high', 'bb_low'], window=20)
+def bollinger_bands(ctx, window):
+    ma = ctx.rolling_mean('close', window)
+    std = ctx.rolling_std('close', window)
+    return {'bb_high': ma + (std * 2), 'bb_low': ma - (std * 2)}
+
+def _register_add_function(name, add, inputs, outputs, **params):
+    """Registers one of the build_features add_* functions as an indicator."""
+    def indicator(ctx, **kwargs):
+        frame = add(ctx.frame(inputs), **kwargs)
+        return {column: frame[column] for column in (o.format(**kwargs) for o in outputs)}
+    register_indicator(name, inputs=inputs, outputs=outputs, **params)(indicator)
+
+_register_add_function('ema', lambda d, span: add_ema(d, [span]), ['close'], ['ema_{span}'], span=12)
+_register_add_function('macd', add_macd, ['close'], ['macd', 'macd_signal', 'macd_hist'], fast=12, slow=26, signal=9)
+_register_add_function('atr', add_atr, ['high', 'low', 'close'], ['atr'], window=14)
+_register_add_function('obv', add_obv, ['close', 'volume'], ['obv'])
+_register_add_function('vwap', add_vwap, ['high', 'low', 'close', 'volume'], ['vwap'], window=20)
+_register_add_function('stoch', add_stochastic, ['high', 'low', 'close'], ['stoch_k', 'stoch_d'], window=14, smooth=3)
+_register_add_function('zscore', add_zscore, ['close'], ['zscore_{window}'], window=20)
+_register_add_function('log_return', add_log_returns, ['close'], ['log_return'])
+
+DEFAULT_FEATURES = ['ma_5', 'ma_20', 'ma_50', 'rsi', 'bb_high', 'bb_low']
+
+def _output_pattern(template, params):
+    """Regex matching an output template, e.g. 'ma_{window}' -> 'ma_(?P<window>\\d+)'."""
+    def field_regex(match):
+        default = params.get(match.group(1))
+        value = r'\d+' if isinstance(default, int) else r'[\w.]+'
+        return f'(?P<{match.group(1)}>{value})'
+    parts = re.split(r'(\{\w+\})', template)
+    return '^' + ''.join(re.sub(r'\{(\w+)\}', field_regex, p) if p.startswith('{') else re.escape(p)
+                         for p in parts) + '$'
+
+def resolve_feature(feature):
+    """
+    Turns a feature request into (indicator name, params).
+
+    Parameters:
+    - feature (str or tuple): An output column such as 'ma_5' or 'bb_high', an indicator
+      name such as 'rsi', or an explicit (indicator name, params dict) pair.
+
+    Returns:
+    - tuple: (indicator name, tuple of sorted (param, value) pairs).
+    """
+    if isinstance(feature, tuple):
+        name, params = feature
+        return name, tuple(sorted({**INDICATORS[name].params, **params}.items()))
+    if feature in INDICATORS:
+        return feature, tuple(sorted(INDICATORS[feature].params.items()))
+    for indicator in INDICATORS.values():
+        for template in indicator.outputs:
+            match = re.match(_output_pattern(template, indicator.params), feature)
+            if match:
+                params = dict(indicator.params)
+                for key, value in match.groupdict().items():
+                    params[key] = type(params[key])(value) if params.get(key) is not None else value
+                return indicator.name, tuple(sorted(params.items()))
+    raise ValueError(f"No registered indicator produces '{feature}'")
+
+def plan_features(features, columns):
+    """
+    Resolves requested features and everything they depend on into execution levels:
+    the indicators of one level only need raw columns or outputs of earlier levels.
+
+    Parameters:
+    - features (list): Feature requests (see resolve_feature).
+    - columns (list): Columns already present in the frame.
+
+    Returns:
+    - list: Levels, each a list of (indicator name, params) pairs in request order.
+    """
+    available = set(columns)
+    # Insertion ordered: requested indicators first, in request order, then their dependencies
+    dependencies = {}
+    queue = [resolve_feature(f) for f in features]
+    while queue:
+        request = queue.pop(0)
+        if request in dependencies:
+            continue
+        name, params = request
+        needed = [c for c in INDICATORS[name].input_columns(dict(params)) if c not in available]
+        dependencies[request] = {resolve_feature(c) for c in needed}
+        queue.extend(dependencies[request])
+
+    levels, done = [], set()
+    while len(done) < len(dependencies):
+        level = [r for r in dependencies if r not in done and dependencies[r] <= done]
+        if not level:
+            raise ValueError("Circular dependency between features")
+        levels.append(level)
+        done.update(level)
+    return levels
+
+def compute_features(data, features=None, n_jobs=1):
+    """
+    Computes only the requested features, sharing intermediates between indicators.
+
+    Parameters:
+    - data (pandas.DataFrame): Stock price data, one symbol or a long-format panel with a 'symbol' column.
+    - features (list, optional): Feature requests (see resolve_feature), the build_features set by default.
+    - n_jobs (int): Number of threads running independent indicators of a level in parallel.
+
+    Returns:
+    - pandas.DataFrame: The frame with every output column of the planned indicators added.
+    """
+    levels = plan_features(features or DEFAULT_FEATURES, data.columns)
+
+    # Group interleaved panels into per-symbol blocks once, like build_features
+    panel = _symbol_panel(data)
+    order = panel[0] if panel is not None else None
+    if order is not None:
+        # A copy, not a slice of the caller's frame: the feature columns are written into it
+        data = data.iloc[order].copy()
+    ctx = FeatureContext(data, None if panel is None else (None, panel[1]))
+
+    def run(request):
+        name, params = request
+        return INDICATORS[name].func(ctx, **dict(params))
+
+    with ThreadPoolExecutor(max_workers=max(n_jobs, 1)) as executor:
+        for level in levels:
+            for outputs in executor.map(run, level):
+                for column, values in outputs.items():
+                    data[column] = values
+
+    if order is not None:
+        data = data.iloc[np.argsort(order)]
+    return data
@@ -0,0 +1,148 @@
+# src/models/dataset.py
+
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+from torch.utils.data import Dataset, DataLoader
+
+"""
+Windowed training samples for sequence models. Every sample is a (window, n_features)
+view into the per-symbol feature arrays (sliding_window_view), so the dataset costs no
+memory beyond the arrays themselves; only the samples drawn into a batch are copied.
+Windows never span two symbols.
+"""
+
+class WindowDataset(Dataset):
+    """
+    Samples (window, n_features) feature windows and, when targets are given, the target
+    `horizon` rows after the end of each window.
+    """
+
+    def __init__(self, blocks, window, targets=None, horizon=1, stride=1, symbols=None):
+        """
+        Parameters:
+        - blocks (list): One (n_rows, n_features) array per symbol, rows in date order.
+        - window (int): Rows per sample.
+        - targets (list, optional): One (n_rows,) target array per block, aligned with its rows.
+        - horizon (int): Rows between the last row of a window and its target (1 = next row).
+        - stride (int): Rows between the starts of consecutive windows of a symbol.
+        - symbols (list, optional): Symbol of every block.
+        """
+        if targets is not None and len(targets) != len(blocks):
+            raise ValueError("targets needs one array per block")
+        self.window = window
+        self.horizon = horizon if targets is not None else 0
+        self.stride = stride
+        self.symbols = list(symbols) if symbols is not None else list(range(len(blocks)))
+
+        # (n_windows, window, n_features) views, one per block
+        self.views = []
+        self.targets = []
+        counts = []
+        for i, block in enumerate(blocks):
+            block = np.asarray(block)
+            n_windows = max((len(block) - window - self.horizon) // stride + 1, 0)
+            if n_windows:
+                view = sliding_window_view(block, window, axis=0).swapaxes(1, 2)[::stride][:n_windows]
+            else:
+                view = np.empty((0, window, block.shape[1]), dtype=block.dtype)
+            self.views.append(view)
+            self.targets.append(None if targets is None else np.asarray(targets[i]))
+            counts.append(n_windows)
+        self.offsets = np.r_[0, np.cumsum(counts)]
+
+    @classmethod
+    def from_frame(cls, data, feature_columns, window, target_column=None, symbol_column='symbol', dtype=np.float32,
+                   **kwargs):
+        """
+        Builds the dataset from a long-format frame (e.g. prepare_data's output).
+
+        Parameters:
+        - data (pandas.DataFrame): Rows of each symbol in date order.
+        - feature_columns (list): Columns of each window.
+        - window (int): Rows per sample.
+        - target_column (str, optional): Column to predict.
+        - dtype: Array dtype of the features and targets.
+        - **kwargs: horizon and stride, see WindowDataset.
+
+        Returns:
+        - WindowDataset: The dataset.
+        """
+        groups = data.groupby(symbol_column, sort=False) if symbol_column in data.columns else [(None, data)]
+        symbols, blocks, targets = [], [], []
+        for symbol, group in groups:
+            symbols.append(symbol)
+            blocks.append(group[feature_columns].to_numpy(dtype=dtype))
+            if target_column is not None:
+                targets.append(group[target_column].to_numpy(dtype=dtype))
+        return cls(blocks, window, targets if target_column is not None else None, symbols=symbols, **kwargs)
+
+    @classmethod
+    def from_store(cls, store, window, target_column=None, **kwargs):
+        """
+        Builds the dataset on a FeatureStore: windows are views into its memory map, so
+        nothing is read from disk until a sample is drawn.
+
+        Parameters:
+        - store (FeatureStore): The feature store.
+        - window (int): Rows per sample.
+        - target_column (str, optional): Stored column to predict (it stays in the features too).
+        - **kwargs: horizon and stride, see WindowDataset.
+
+        Returns:
+        - WindowDataset: The dataset.
+        """
+        symbols = store.symbols
+        blocks = [store.array(symbol) for symbol in symbols]
+        targets = None
+        if target_column is not None:
+            column = store.column_index(target_column)
+            targets = [block[:, column] for block in blocks]
+        return cls(blocks, window, targets, symbols=symbols, **kwargs)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def locate(self, index):
+        """Returns the (symbol, first row) of sample `index`."""
+        block = int(np.searchsorted(self.offsets, index, side='right')) - 1
+        return self.symbols[block], (index - int(self.offsets[block])) * self.stride
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        block = int(np.searchsorted(self.offsets, index, side='right')) - 1
+        position = index - int(self.offsets[block])
+        # The views are read-only; a sample is small, copying it is what collation would do anyway
+        x = torch.tensor(self.views[block][position])
+        if self.targets[block] is None:
+            return x
+        end = position * self.stride + self.window - 1
+        y = torch.as_tensor(self.targets[block][end + self.horizon])
+        return x, y
+
+def make_data_loader(dataset, batch_size=64, shuffle=True, num_workers=0, pin_memory=None, drop_last=False,
+                     seed=None):
+    """
+    Wraps a WindowDataset in a DataLoader.
+
+    Parameters:
+    - dataset (WindowDataset): The samples.
+    - batch_size (int): Samples per batch, batches are (batch_size, window, n_features).
+    - shuffle (bool): Draw samples in random order (across symbols).
+    - num_workers (int): Worker processes assembling batches in parallel.
+    - pin_memory (bool, optional): Page-locked batches for faster host-to-GPU copies, on when CUDA is available.
+    - drop_last (bool): Skip the last incomplete batch.
+    - seed (int, optional): Seed of the shuffling order.
+
+    Returns:
+    - torch.utils.data.DataLoader: The loader.
+    """
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    generator = torch.Generator().manual_seed(seed) if seed is not None else None
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers,
+                      pin_memory=pin_memory, drop_last=drop_last, generator=generator,
+                      persistent_workers=num_workers > 0)
@@ -0,0 +1,297 @@
+# src/models/predict_model.py
+
+import os
+import hashlib
+import logging
+import numpy as np
+import torch
+from src.models.train_model import load_model
+
+"""
+Incremental inference for a trained MambaRegressor. Instead of re-running the model over
+a symbol's whole history for every new bar (what PredictWithData of deprecated/main.py did,
+retraining included), the predictor keeps the recurrent caches of every symbol, one
+(h, inputs) pair per layer (see the inference notes in deprecated/mamba.py), and advances
+them by a single step per bar: constant time and memory per bar whatever the history length.
+
+After feeding bars b_1..b_t, a symbol's prediction equals the model's forward pass over the
+sequence b_1..b_t. The caches can be saved and loaded, so a restarted process resumes where
+it stopped without replaying history.
+"""
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+def _model_digest(model):
+    """Fingerprint of the model's weights, to refuse caches computed by another model."""
+    digest = hashlib.sha256()
+    for name, tensor in model.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+class StreamingPredictor:
+    """
+    Per-symbol streaming predictions of a checkpoint written by train_model.
+    """
+
+    def __init__(self, checkpoint_path, device='cpu'):
+        """
+        Parameters:
+        - checkpoint_path (str): Checkpoint file (e.g. checkpoint_dir/best.pt), loaded once.
+        - device (str): Device to run the model on.
+        """
+        self.device = torch.device(device)
+        self.model = load_model(checkpoint_path, self.device)
+        self.digest = _model_digest(self.model)
+        self.caches = {}
+        self.n_steps = {}
+
+    @property
+    def symbols(self):
+        return list(self.caches)
+
+    def update(self, symbol, features):
+        """
+        Advances a symbol by one bar.
+
+        Parameters:
+        - symbol (str): The symbol, its caches are created on its first bar.
+        - features (array-like): (in_dim,) features of the new bar, in training column order.
+
+        Returns:
+        - float: Prediction after this bar.
+        """
+        x = torch.as_tensor(np.asarray(features, dtype=np.float32), device=self.device).reshape(1, -1)
+        caches = self.caches.get(symbol)
+        if caches is None:
+            caches = self.model.init_caches(1, self.device)
+        with torch.no_grad():
+            prediction, caches = self.model.step(x, caches)
+        self.caches[symbol] = caches
+        self.n_steps[symbol] = self.n_steps.get(symbol, 0) + 1
+        return prediction.item()
+
+    def update_many(self, bars):
+        """
+        Advances several symbols by one bar each.
+
+        Parameters:
+        - bars (dict): Features of the new bar by symbol.
+
+        Returns:
+        - dict: Prediction by symbol.
+        """
+        return {symbol: self.update(symbol, features) for symbol, features in bars.items()}
+
+    def warm_up(self, symbol, history):
+        """
+        Feeds a symbol's past bars, oldest first (e.g. when it enters the universe).
+
+        Parameters:
+        - symbol (str): The symbol.
+        - history (array-like): (n_bars, in_dim) features.
+
+        Returns:
+        - float: Prediction after the last bar, None when history is empty.
+        """
+        prediction = None
+        for features in np.asarray(history, dtype=np.float32):
+            prediction = self.update(symbol, features)
+        return prediction
+
+    def reset(self, symbol=None):
+        """Forgets the caches of a symbol, or of every symbol."""
+        if symbol is None:
+            self.caches.clear()
+            self.n_steps.clear()
+        else:
+            self.caches.pop(symbol, None)
+            self.n_steps.pop(symbol, None)
+
+    def save_state(self, path):
+        """
+        Writes the caches of every symbol (atomically, a crash never leaves a partial file).
+
+        Parameters:
+        - path (str): State file.
+        """
+        caches = {
+            symbol: [(None if h is None else h.cpu(), inputs.cpu()) for h, inputs in layers]
+            for symbol, layers in self.caches.items()
+        }
+        torch.save({
+            'version': STATE_VERSION,
+            'model_digest': self.digest,
+            'caches': caches,
+            'n_steps': self.n_steps
+        }, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def load_state(self, path):
+        """
+        Restores the caches written by save_state, replacing the current ones.
+
+        Parameters:
+        - path (str): State file.
+        """
+        state = torch.load(path, map_location=self.device, weights_only=True)
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported state version {state.get('version')}, expected {STATE_VERSION}")
+        if state['model_digest'] != self.digest:
+            raise ValueError("The state was computed by a different model checkpoint")
+        self.caches = {symbol: [tuple(cache) for cache in layers] for symbol, layers in state['caches'].items()}
+        self.n_steps = dict(state['n_steps'])
+        logger.info("Resumed %d symbols from %s", len(self.caches), path)
+
+class SlotCachePool:
+    """
+    Recurrent caches of many symbols packed into preallocated tensors, one slot per symbol,
+    so that a bar of many symbols advances in one batched step.
+
+    Per layer the pool holds the states h as (S, ED, N) and the conv inputs as (S, ED, d_conv-1).
+    Slots are reused as symbols leave and enter the universe; the least recently stepped symbol
+    is evicted when a new one needs a slot and the pool is full. The state tensors, the gather
+    workspaces and the index buffer are allocated once: a step only reads and writes them in place.
+    """
+
+    def __init__(self, model, capacity, device=None, evict=True):
+        """
+        Parameters:
+        - model (MambaRegressor): Trained model, in eval mode.
+        - capacity (int): Number of slots S, the most symbols held at once.
+        - device (str, optional): Device of the caches, the model's by default.
+        - evict (bool): Evict the least recently stepped symbol when full, otherwise raise.
+        """
+        self.model = model.eval()
+        self.device = torch.device(device) if device is not None else model.embed.weight.device
+        self.capacity = capacity
+        self.evict = evict
+        config = model.config
+        n_layers, d_inner, d_state, d_conv = config.n_layers, config.d_inner, config.d_state, config.d_conv
+
+        # (layers, S, ED, N) states and (layers, S, ED, d_conv-1) conv inputs
+        self.h = torch.zeros(n_layers, capacity, d_inner, d_state, device=self.device)
+        self.inputs = torch.zeros(n_layers, capacity, d_inner, d_conv - 1, device=self.device)
+        # batches of slots that are not one contiguous range are gathered here
+        self._h_batch = torch.empty_like(self.h)
+        self._inputs_batch = torch.empty_like(self.inputs)
+        self._x = torch.empty(capacity, model.hparams['in_dim'], device=self.device)
+        self._index_host = np.empty(capacity, dtype=np.int64)
+        self._index = torch.from_numpy(self._index_host) if self.device.type == 'cpu' else \
+            torch.empty(capacity, dtype=torch.long, device=self.device)
+
+        self.slots = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_path, capacity, device='cpu', **kwargs):
+        """Builds the pool on a checkpoint written by train_model."""
+        return cls(load_model(checkpoint_path, device), capacity, device=device, **kwargs)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def acquire(self, symbol, pinned=()):
+        """
+        Returns the slot of a symbol, giving it a fresh (zero) slot if it has none.
+
+        Parameters:
+        - symbol (str): The symbol.
+        - pinned (set): Symbols that must not be evicted to make room (e.g. the rest of a batch).
+
+        Returns:
+        - int: Its slot.
+        """
+        slot = self.slots.get(symbol)
+        if slot is not None:
+            return slot
+        if not self._free:
+            candidates = [s for s in self.slots if s not in pinned]
+            if not self.evict or not candidates:
+                raise RuntimeError(f"All {self.capacity} slots are in use")
+            self.release(min(candidates, key=lambda s: self._last_used[self.slots[s]]))
+        slot = self._free.pop()
+        self.h[:, slot].zero_()
+        self.inputs[:, slot].zero_()
+        self._last_used[slot] = self._clock
+        self.slots[symbol] = slot
+        return slot
+
+    def release(self, symbol):
+        """Frees the slot of a symbol (a no-op for unknown symbols)."""
+        slot = self.slots.pop(symbol, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def set_universe(self, symbols):
+        """Releases the symbols not in `symbols` and acquires slots for the new ones."""
+        symbols = list(symbols)
+        if len(set(symbols)) > self.capacity:
+            raise ValueError(f"{len(set(symbols))} symbols do not fit in {self.capacity} slots")
+        keep = set(symbols)
+        for symbol in [s for s in self.slots if s not in keep]:
+            self.release(symbol)
+        for symbol in symbols:
+            self.acquire(symbol, pinned=keep)
+
+    def step(self, symbols, features):
+        """
+        Advances several symbols by one bar in a single batched model step.
+
+        Parameters:
+        - symbols (list): Distinct symbols with a new bar, acquired if needed.
+        - features (array-like): (len(symbols), in_dim) features of their new bars.
+
+        Returns:
+        - torch.Tensor: (len(symbols),) predictions, in the order of `symbols`.
+        """
+        n = len(symbols)
+        if n > self.capacity:
+            raise ValueError(f"{n} symbols do not fit in {self.capacity} slots")
+        batch = set(symbols)
+        if len(batch) != n:
+            raise ValueError("symbols must be distinct")
+        self._clock += 1
+        # The symbols of the batch are never evicted to make room for its new symbols
+        for i, symbol in enumerate(symbols):
+            self._index_host[i] = self.acquire(symbol, pinned=batch)
+        slots = self._index_host[:n]
+        self._last_used[slots] = self._clock
+
+        x = self._x[:n]
+        x.copy_(torch.as_tensor(features, dtype=x.dtype).reshape(n, -1))
+
+        # Slots start..start+n in order (e.g. a full universe bar) are stepped as views, others gathered
+        start = int(slots[0])
+        contiguous = bool((slots == np.arange(start, start + n)).all())
+        if contiguous:
+            caches = [(self.h[i, start:start + n], self.inputs[i, start:start + n]) for i in range(len(self.h))]
+        else:
+            index = self._index[:n]
+            if self.device.type != 'cpu':
+                index.copy_(torch.from_numpy(self._index_host[:n]), non_blocking=True)
+            caches = []
+            for i in range(len(self.h)):
+                torch.index_select(self.h[i], 0, index, out=self._h_batch[i, :n])
+                torch.index_select(self.inputs[i], 0, index, out=self._inputs_batch[i, :n])
+                caches.append((self._h_batch[i, :n], self._inputs_batch[i, :n]))
+
+        with torch.no_grad():
+            # Mamba.step replaces the list items, the pool views are still in `views`
+            views = list(caches)
+            prediction, caches = self.model.step(x, caches)
+            for i, (new_h, new_inputs) in enumerate(caches):
+                if contiguous:
+                    views[i][0].copy_(new_h)
+                    views[i][1].copy_(new_inputs)
+                else:
+                    self.h[i].index_copy_(0, index, new_h)
+                    self.inputs[i].index_copy_(0, index, new_inputs)
+        return prediction
@@ -0,0 +1,243 @@
+# src/models/train_model.py
+
+import os
+import time
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass, asdict
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from deprecated.mamba import Mamba, MambaConfig
+from src.models.dataset import make_data_loader
+
+"""
+Mini-batch trainer for the Mamba regressor on windows from many symbols (see
+src.models.dataset.WindowDataset), replacing the one-model-per-stock full-batch
+PredictWithData of deprecated/main.py.
+"""
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = {'fp32': None, 'bf16': torch.bfloat16, 'fp16': torch.float16}
+
+class MambaRegressor(nn.Module):
+    """
+    The layers of deprecated/main.py's Net (input projection, Mamba layers, output
+    projection) without its final Tanh, which would bound predictions to (-1, 1), predicting
+    one value per window from its last time step.
+    """
+
+    def __init__(self, in_dim, hidden=16, layers=2, **mamba_args):
+        """
+        Parameters:
+        - in_dim (int): Features per time step.
+        - hidden (int): Model dimension (d_model).
+        - layers (int): Number of Mamba layers.
+        - **mamba_args: Other MambaConfig fields.
+        """
+        super().__init__()
+        self.hparams = dict(in_dim=in_dim, hidden=hidden, layers=layers, **mamba_args)
+        self.config = MambaConfig(d_model=hidden, n_layers=layers, **mamba_args)
+        self.embed = nn.Linear(in_dim, hidden)
+        self.mamba = Mamba(self.config)
+        self.head = nn.Linear(hidden, 1)
+
+    def forward(self, x):
+        # x : (B, L, in_dim) -> (B,)
+        x = self.mamba(self.embed(x))
+        return self.head(x[:, -1]).squeeze(-1)
+
+    def init_caches(self, batch_size=1, device=None):
+        """Empty recurrent caches for `step`: one (h, inputs) per layer, h starts at zero when None."""
+        device = device or self.embed.weight.device
+        shape = (batch_size, self.config.d_inner, self.config.d_conv - 1)
+        return [(None, torch.zeros(shape, device=device)) for _ in range(self.config.n_layers)]
+
+    def step(self, x, caches):
+        """
+        Advances the recurrence by one time step: feeding a window row by row from empty caches
+        gives forward's prediction for the window after its last row.
+
+        Parameters:
+        - x (torch.Tensor): (B, in_dim) features of the new time step.
+        - caches (list): Per-layer (h, inputs) caches, see init_caches.
+
+        Returns:
+        - tuple: ((B,) predictions, updated caches).
+        """
+        x, caches = self.mamba.step(self.embed(x), caches)
+        return self.head(x).squeeze(-1), caches
+
+@dataclass
+class TrainConfig:
+    epochs: int = 100
+    lr: float = 0.01
+    weight_decay: float = 1e-5
+    batch_size: int = 64
+    accumulation_steps: int = 1 # batches whose gradients are summed before each optimizer step
+    patience: int = 10 # epochs without improvement before stopping, None to never stop early
+    min_delta: float = 0.0
+    precision: str = 'fp32' # 'fp32', 'bf16' (CPU or GPU autocast) or 'fp16' (GPU only)
+    grad_clip: float = None
+    num_workers: int = 0
+    checkpoint_dir: str = None
+    device: str = 'cpu'
+    seed: int = 1
+
+def _autocast(device, precision):
+    if PRECISIONS[precision] is None:
+        return nullcontext()
+    return torch.autocast(device_type=device.type, dtype=PRECISIONS[precision])
+
+def _save_checkpoint(path, model, optimizer, scaler, epoch, best_loss, stale_epochs, config, history):
+    torch.save({
+        'model': model.state_dict(),
+        'model_hparams': model.hparams,
+        'optimizer': optimizer.state_dict(),
+        'scaler': scaler.state_dict(),
+        'epoch': epoch,
+        'best_loss': best_loss,
+        'stale_epochs': stale_epochs,
+        'config': asdict(config),
+        'history': history
+    }, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def load_model(path, device='cpu'):
+    """
+    Rebuilds a trained MambaRegressor from a checkpoint written by train_model.
+
+    Parameters:
+    - path (str): Checkpoint file (e.g. checkpoint_dir/best.pt).
+    - device (str): Device to load the weights to.
+
+    Returns:
+    - MambaRegressor: The model, in eval mode.
+    """
+    checkpoint = torch.load(path, map_location=device, weights_only=True)
+    model = MambaRegressor(**checkpoint['model_hparams'])
+    model.load_state_dict(checkpoint['model'])
+    return model.to(device).eval()
+
+def evaluate(model, loader, device, precision='fp32'):
+    """Mean squared error of the model over a loader."""
+    model.eval()
+    total, count = 0.0, 0
+    with torch.no_grad(), _autocast(device, precision):
+        for x, y in loader:
+            x, y = x.to(device, non_blocking=True), y.to(device, non_blocking=True)
+            total += F.mse_loss(model(x).float(), y.float(), reduction='sum').item()
+            count += len(y)
+    return total / max(count, 1)
+
+def train_model(train_dataset, val_dataset=None, config=None, model=None, resume=False):
+    """
+    Trains a regressor on window samples with mini-batches, gradient accumulation, mixed
+    precision, checkpointing and early stopping.
+
+    Parameters:
+    - train_dataset (WindowDataset): Training windows and targets.
+    - val_dataset (WindowDataset, optional): Validation windows, used for early stopping and the best
+      checkpoint (the training loss is used otherwise).
+    - config (TrainConfig, optional): Training settings.
+    - model (nn.Module, optional): Model to train, a MambaRegressor sized for the data by default.
+    - resume (bool): Continue from checkpoint_dir/last.pt if it exists.
+
+    Returns:
+    - tuple: (model, history) with one dict per epoch: losses, seconds and samples/sec.
+    """
+    config = config or TrainConfig()
+    if config.precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{config.precision}', expected one of {list(PRECISIONS)}")
+    torch.manual_seed(config.seed)
+    np.random.seed(config.seed)
+    device = torch.device(config.device)
+
+    if model is None:
+        model = MambaRegressor(train_dataset[0][0].shape[-1])
+    model = model.to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=config.lr, weight_decay=config.weight_decay)
+    # fp16 gradients underflow without loss scaling, bf16 has fp32's range and does not need it
+    scaler = torch.amp.GradScaler(device.type, enabled=config.precision == 'fp16')
+
+    train_loader = make_data_loader(train_dataset, config.batch_size, shuffle=True, num_workers=config.num_workers,
+                                    pin_memory=device.type == 'cuda', seed=config.seed)
+    val_loader = None
+    if val_dataset is not None:
+        val_loader = make_data_loader(val_dataset, config.batch_size, shuffle=False, num_workers=config.num_workers,
+                                      pin_memory=device.type == 'cuda')
+
+    history, best_loss, start_epoch, stale_epochs = [], float('inf'), 0, 0
+    last_path = best_path = None
+    if config.checkpoint_dir is not None:
+        os.makedirs(config.checkpoint_dir, exist_ok=True)
+        last_path = os.path.join(config.checkpoint_dir, 'last.pt')
+        best_path = os.path.join(config.checkpoint_dir, 'best.pt')
+        if resume and os.path.exists(last_path):
+            checkpoint = torch.load(last_path, map_location=device, weights_only=True)
+            model.load_state_dict(checkpoint['model'])
+            optimizer.load_state_dict(checkpoint['optimizer'])
+            start_epoch, best_loss, history = checkpoint['epoch'] + 1, checkpoint['best_loss'], checkpoint['history']
+            stale_epochs = checkpoint.get('stale_epochs', 0)
+            if checkpoint.get('scaler'):
+                scaler.load_state_dict(checkpoint['scaler'])
+            logger.info("Resuming from epoch %d", start_epoch)
+
+    for epoch in range(start_epoch, config.epochs):
+        model.train()
+        start = time.perf_counter()
+        total_loss, n_samples = 0.0, 0
+        optimizer.zero_grad(set_to_none=True)
+        # The last group of batches can be smaller than accumulation_steps: average over its real size
+        n_batches = len(train_loader)
+        last_group_start = n_batches - (n_batches % config.accumulation_steps or config.accumulation_steps)
+
+        for i, (x, y) in enumerate(train_loader):
+            x, y = x.to(device, non_blocking=True), y.to(device, non_blocking=True)
+            with _autocast(device, config.precision):
+                loss = F.mse_loss(model(x).float(), y.float())
+            group_size = config.accumulation_steps if i < last_group_start else n_batches - last_group_start
+            scaler.scale(loss / group_size).backward()
+            total_loss += loss.item() * len(y)
+            n_samples += len(y)
+
+            if (i + 1) % config.accumulation_steps == 0 or i + 1 == n_batches:
+                if config.grad_clip is not None:
+                    scaler.unscale_(optimizer)
+                    nn.utils.clip_grad_norm_(model.parameters(), config.grad_clip)
+                scaler.step(optimizer)
+                scaler.update()
+                optimizer.zero_grad(set_to_none=True)
+
+        train_seconds = time.perf_counter() - start
+        train_loss = total_loss / max(n_samples, 1)
+        val_loss = evaluate(model, val_loader, device, config.precision) if val_loader is not None else None
+        stats = {
+            'epoch': epoch,
+            'train_loss': train_loss,
+            'val_loss': val_loss,
+            'seconds': time.perf_counter() - start,
+            'train_seconds': train_seconds,
+            'samples_per_sec': n_samples / train_seconds if train_seconds > 0 else float('inf')
+        }
+        history.append(stats)
+        logger.info("Epoch %d | train %.4f | val %s | %.0f samples/s", epoch, train_loss,
+                    'n/a' if val_loss is None else f"{val_loss:.4f}", stats['samples_per_sec'])
+
+        monitored = val_loss if val_loss is not None else train_loss
+        improved = monitored < best_loss - config.min_delta
+        if improved:
+            best_loss, stale_epochs = monitored, 0
+        else:
+            stale_epochs += 1
+        if last_path is not None:
+            _save_checkpoint(last_path, model, optimizer, scaler, epoch, best_loss, stale_epochs, config, history)
+            if improved:
+                _save_checkpoint(best_path, model, optimizer, scaler, epoch, best_loss, stale_epochs, config, history)
+        if config.patience is not None and stale_epochs >= config.patience:
+            logger.info("Early stopping after epoch %d", epoch)
+            break
+
+    return model, history
@@ -1,12 +1,23 @@
 # tests/unit/test_data.py
 
 import unittest
+import numpy as np
 import pandas as pd
+import os
+import time
 import warnings
+import tempfile
+from sqlalchemy import create_engine, inspect
 from unittest.mock import patch
-from src.data.fetch_data import fetch_stock_data
-from src.data.save_data import save_data_to_csv, save_data_to_db
+from src.data.fetch_data import fetch_stock_data, fetch_many_stock_data, iter_stock_data, make_row_ids
+from src.data.price_cache import PriceCache
+from src.data.load_data import load_stock_data
+from src.data.splits import walk_forward_splits, n_walk_forward_splits
+from src.data.save_data import save_data_to_csv, save_data_to_db, save_data_to_parquet, dispose_engines, partition_table_name
 from src.data.process_data import clean_data, normalize_features, prepare_data, pad_missing_values
+from src.data.process_data import FeatureNormalizer, rolling_normalize, iter_prepared_data, prepare_data_to_file, fill_gaps
+from src.features.build_features import build_features
+from src.features.feature_store import FeatureStore
 
 
 
@@ -42,6 +53,120 @@ class TestDataFetch(unittest.TestCase):
         pd.testing.assert_frame_equal(result_df, expected_df)
 
 
+def fake_history(ticker_symbol, start_date, end_date):
+    """Local stand-in for the Yahoo provider: three flat daily bars per symbol."""
+    dates = pd.date_range(start=start_date, periods=3, freq='D')
+    return pd.DataFrame({
+        'Open': [1.0, 2.0, 3.0],
+        'High': [1.0, 2.0, 3.0],
+        'Low': [1.0, 2.0, 3.0],
+        'Close': [1.0, 2.0, 3.0],
+        'Volume': [10, 20, 30]
+    }, index=pd.Index(dates, name='Date'))
+
+
+class TestFetchManyStockData(unittest.TestCase):
+    def test_fetch_many_long_format(self):
+        symbols = ['msft', 'aapl', 'goog']
+        result = fetch_many_stock_data(symbols, '2020-01-01', '2020-01-04', max_workers=2, provider=fake_history)
+
+        self.assertEqual(len(result), 9)
+        self.assertEqual(sorted(result['symbol'].unique()), ['AAPL', 'GOOG', 'MSFT'])
+        self.assertEqual(list(result['symbol'].iloc[:3]), ['AAPL'] * 3)
+        self.assertIn('close', result.columns)
+
+    def test_stopping_early_does_not_wait_for_pending_fetches(self):
+        def slow_history(ticker_symbol, start_date, end_date):
+            time.sleep(0.2)
+            return fake_history(ticker_symbol, start_date, end_date)
+
+        start = time.perf_counter()
+        stream = iter_stock_data([f"S{i}" for i in range(20)], '2020-01-01', '2020-01-04',
+                                 max_workers=2, provider=slow_history)
+        next(stream)
+        stream.close()
+        # 20 fetches two at a time would take 2s; only the first ones and those in flight run
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_retry_then_skip(self):
+        calls = {'flaky': 0}
+
+        def flaky_history(ticker_symbol, start_date, end_date):
+            if ticker_symbol == 'BAD':
+                raise ConnectionError("always down")
+            if ticker_symbol == 'FLAKY' and calls['flaky'] == 0:
+                calls['flaky'] += 1
+                raise ConnectionError("first call fails")
+            return fake_history(ticker_symbol, start_date, end_date)
+
+        results = dict(iter_stock_data(['GOOD', 'FLAKY', 'BAD'], '2020-01-01', '2020-01-04',
+                                       provider=flaky_history, retries=1, backoff=0))
+        self.assertEqual(sorted(results), ['FLAKY', 'GOOD'])
+        self.assertEqual(calls['flaky'], 1)
+
+
+class TestRowIds(unittest.TestCase):
+    def test_hash_ids_are_stable_and_unique(self):
+        first = fetch_stock_data('AAPL', '2020-01-01', '2020-01-04', provider=fake_history, id_mode='hash')
+        second = fetch_stock_data('aapl', '2020-01-01', '2020-01-04', provider=fake_history, id_mode='hash')
+        other = fetch_stock_data('MSFT', '2020-01-01', '2020-01-04', provider=fake_history, id_mode='hash')
+
+        self.assertEqual(first['id'].dtype, 'int64')
+        self.assertEqual(list(first['id']), list(second['id']))
+        self.assertTrue(first['id'].is_unique)
+        self.assertFalse(set(first['id']) & set(other['id']))
+
+    def test_make_row_ids_matches_scalar_calls(self):
+        symbols = ['AAPL', 'MSFT', 'AAPL']
+        dates = ['2020-01-01', '2020-01-01', '2020-01-02']
+        ids = make_row_ids(symbols, dates)
+        for i in range(3):
+            self.assertEqual(ids[i], make_row_ids([symbols[i]], [dates[i]])[0])
+
+    def test_unknown_id_mode(self):
+        with self.assertRaises(ValueError):
+            fetch_stock_data('AAPL', '2020-01-01', '2020-01-04', provider=fake_history, id_mode='nope')
+
+class TestPriceCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.calls = []
+
+        def daily_history(ticker_symbol, start_date, end_date):
+            # One bar per calendar day in [start, end), close equal to the day of the month
+            self.calls.append((start_date, end_date))
+            dates = pd.date_range(start=start_date, end=end_date, freq='D', inclusive='left')
+            return pd.DataFrame({'Close': dates.day.astype(float)}, index=pd.Index(dates, name='Date'))
+
+        self.cache = PriceCache(self.tmpdir.name, provider=daily_history)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hit_does_not_call_provider(self):
+        first = self.cache.fetch('AAPL', '2020-01-01', '2020-01-11')
+        second = self.cache.fetch('AAPL', '2020-01-03', '2020-01-06')
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 3)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_refresh_fetches_only_delta(self):
+        self.cache.fetch('AAPL', '2020-01-01', '2020-01-11')
+        data = self.cache.fetch('AAPL', '2020-01-01', '2020-01-15')
+        self.assertEqual(self.calls[-1], ('2020-01-10', '2020-01-15'))
+        self.assertEqual(len(data), 14)
+        self.assertFalse(data['date'].duplicated().any())
+
+    def test_ttl_and_invalidate(self):
+        self.cache.fetch('AAPL', '2020-01-01', '2020-01-11')
+        self.cache.invalidate('AAPL')
+        self.cache.fetch('AAPL', '2020-01-01', '2020-01-11')
+        self.assertEqual(len(self.calls), 2)
+
+        expiring = PriceCache(self.tmpdir.name, ttl=0, provider=self.cache.provider)
+        expiring.fetch('AAPL', '2020-01-01', '2020-01-11')
+        self.assertEqual(len(self.calls), 3)
+
 class TestSaveDataCSV(unittest.TestCase):
     @patch("pandas.DataFrame.to_csv")
     def test_save_data_to_csv(self, mock_to_csv):
@@ -58,6 +183,13 @@ class TestSaveDataCSV(unittest.TestCase):
         mock_to_csv.assert_called_once_with(filename, index=False)
 
 class TestSaveDataDB(unittest.TestCase):
+    def setUp(self):
+        # Engines are cached per URL, start every test from an empty cache
+        dispose_engines()
+
+    def tearDown(self):
+        dispose_engines()
+
     @patch('pandas.DataFrame.to_sql')
     @patch('src.data.save_data.create_engine')
     def test_save_data_to_db(self, mock_create_engine, mock_to_sql):
@@ -87,6 +219,132 @@ class TestSaveDataDB(unittest.TestCase):
         self.assertEqual(call_kwargs['index'], False)
         self.assertEqual(call_kwargs['if_exists'], 'append')
 
+    @patch('src.data.save_data.create_engine')
+    def test_engine_is_reused(self, mock_create_engine):
+        data = pd.DataFrame({'date': ['2020-01-01'], 'close': [300]})
+        with patch('pandas.DataFrame.to_sql'):
+            save_data_to_db(data, 'sqlite:///test_stock_data.db')
+            save_data_to_db(data, 'sqlite:///test_stock_data.db')
+        mock_create_engine.assert_called_once()
+
+    def test_upsert_does_not_duplicate(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            database_url = f"sqlite:///{tmpdir}/test.db"
+            first = pd.DataFrame({
+                'symbol': ['AAPL', 'AAPL', 'MSFT'],
+                'date': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-01']).date,
+                'close': [1.0, 2.0, 3.0]
+            })
+            second = pd.DataFrame({
+                'symbol': ['AAPL', 'MSFT'],
+                'date': pd.to_datetime(['2020-01-02', '2020-01-02']).date,
+                'close': [20.0, 4.0]
+            })
+            save_data_to_db(first, database_url, upsert=True)
+            written = save_data_to_db(second, database_url, upsert=True)
+            self.assertEqual(written, 2)
+
+            result = pd.read_sql('SELECT * FROM stock_data ORDER BY symbol, date', create_engine(database_url))
+            self.assertEqual(len(result), 4)
+            self.assertEqual(list(result['close']), [1.0, 20.0, 3.0, 4.0])
+            dispose_engines()
+
+    def test_schema_and_partitions(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            database_url = f"sqlite:///{tmpdir}/test.db"
+            data = pd.DataFrame({
+                'symbol': ['AAPL', 'AAPL', 'MSFT'],
+                'date': pd.to_datetime(['2019-12-31', '2020-01-02', '2020-01-02']).date,
+                'close': [1.0, 2.0, 3.0],
+                'volume': [10, 20, 30],
+                'rsi': [50.0, 60.0, 70.0]
+            })
+            save_data_to_db(data, database_url, partition_by='symbol')
+            save_data_to_db(data, database_url, table_name='by_year', partition_by='year', upsert=True)
+
+            inspector = inspect(create_engine(database_url))
+            self.assertEqual(sorted(inspector.get_table_names()),
+                             ['by_year__2019', 'by_year__2020', 'stock_data__aapl', 'stock_data__msft'])
+            self.assertEqual(inspector.get_pk_constraint('stock_data__aapl')['constrained_columns'], ['symbol', 'date'])
+            columns = {c['name']: str(c['type']) for c in inspector.get_columns('stock_data__aapl')}
+            self.assertEqual(columns['volume'], 'BIGINT')
+            self.assertIn('rsi', columns)
+            self.assertEqual(partition_table_name('stock_data', 'symbol', '^GSPC'), 'stock_data___5egspc')
+            self.assertNotEqual(partition_table_name('stock_data', 'symbol', 'BRK.B'),
+                                partition_table_name('stock_data', 'symbol', 'BRK-B'))
+            with self.assertRaises(ValueError):
+                save_data_to_db(data.assign(symbol=['AAPL', 'aapl', 'MSFT']), database_url, partition_by='symbol')
+            dispose_engines()
+
+class TestLoadStockData(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        dates = pd.date_range(start='2019-12-30', periods=6, freq='D')
+        self.data = pd.DataFrame({
+            'symbol': ['AAPL'] * 6 + ['MSFT'] * 6,
+            'date': list(dates.date) * 2,
+            'close': [float(i) for i in range(12)],
+            'volume': list(range(12))
+        })
+
+    def tearDown(self):
+        dispose_engines()
+        self.tmpdir.cleanup()
+
+    def check_range(self, result):
+        self.assertEqual(list(result['symbol'].unique()), ['AAPL'])
+        self.assertEqual(list(result['close']), [2.0, 3.0])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(result['date']))
+        self.assertEqual(result['volume'].dtype, 'int64')
+
+    def test_load_from_db(self):
+        database_url = f"sqlite:///{self.tmpdir.name}/test.db"
+        save_data_to_db(self.data, database_url, partition_by='year')
+        result = load_stock_data('aapl', '2020-01-01', '2020-01-03', source=database_url, partition_by='year')
+        self.check_range(result)
+
+    def test_load_from_parquet_in_chunks(self):
+        path = f"{self.tmpdir.name}/prices.parquet"
+        self.data.to_parquet(path, index=False)
+        chunks = load_stock_data('AAPL', '2020-01-01', '2020-01-03', source=path,
+                                 columns=['symbol', 'date', 'close', 'volume'], chunksize=1)
+        result = pd.concat(list(chunks), ignore_index=True)
+        self.check_range(result)
+
+    def test_parquet_dataset_append_and_partitions(self):
+        path = f"{self.tmpdir.name}/dataset"
+        save_data_to_parquet(self.data.iloc[:3], path, partition_by=('symbol', 'year'))
+        save_data_to_parquet(self.data.iloc[3:], path, partition_by=('symbol', 'year'))
+        self.assertTrue(os.path.isdir(os.path.join(path, 'symbol=AAPL', 'year=2020')))
+
+        result = load_stock_data('AAPL', '2020-01-01', '2020-01-03', source=path)
+        self.check_range(result)
+        self.assertNotIn('year', result.columns)
+        self.assertEqual(len(load_stock_data(None, source=path)), 12)
+
+        save_data_to_parquet(self.data.iloc[:3], path, append=False)
+        self.assertEqual(len(load_stock_data(None, source=path)), 3)
+
+    def test_projection_and_float32(self):
+        database_url = f"sqlite:///{self.tmpdir.name}/test.db"
+        save_data_to_db(self.data, database_url)
+        result = load_stock_data(['MSFT'], source=database_url, columns=['date', 'close'], float32=True)
+        self.assertEqual(list(result.columns), ['date', 'close'])
+        self.assertEqual(result['close'].dtype, 'float32')
+        self.assertEqual(len(result), 6)
+
+    def test_datetime64_dates_round_trip(self):
+        database_url = f"sqlite:///{self.tmpdir.name}/test.db"
+        data = self.data.assign(date=pd.to_datetime(self.data['date']))
+        save_data_to_db(data, database_url)
+        result = load_stock_data('AAPL', '2020-01-01', '2020-01-03', source=database_url)
+        self.check_range(result)
+
+        save_data_to_db(data.assign(close=data['close'] + 100), database_url, upsert=True)
+        result = load_stock_data(None, source=database_url)
+        self.assertEqual(len(result), 12)
+        self.assertEqual(list(result['close']), [float(i) + 100 for i in range(12)])
+
 class TestProcessData(unittest.TestCase):
 
     def test_clean_data(self):
@@ -186,6 +444,205 @@ class TestProcessData(unittest.TestCase):
         # TODO: add the necessary assertIn checks for those feature column names as well.
         
 
+class TestFeatureNormalizer(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.data = pd.DataFrame({
+            'id': np.arange(100, dtype=np.int64) * 1000,
+            'close': 100 + rng.normal(0, 1, 100).cumsum(),
+            'volume': rng.integers(1000, 100000, 100),
+            'rsi': rng.uniform(0, 100, 100)
+        })
+
+    def test_fit_on_train_only(self):
+        train, test = self.data.iloc[:80].copy(), self.data.iloc[80:].copy()
+        normalizer = FeatureNormalizer().fit(train)
+        self.assertEqual(normalizer.columns, ['close', 'volume', 'rsi'])
+        test = normalizer.transform(test)
+        train = normalizer.transform(train)
+        np.testing.assert_allclose(train[normalizer.columns].mean(), 0, atol=1e-10)
+        expected = (self.data['close'].iloc[80:] - self.data['close'].iloc[:80].mean()) / self.data['close'].iloc[:80].std(ddof=0)
+        np.testing.assert_allclose(test['close'], expected)
+        np.testing.assert_array_equal(test['id'], self.data['id'].iloc[80:])
+
+    def test_volume_is_log_scaled(self):
+        result = FeatureNormalizer().fit_transform(self.data.copy())
+        log_volume = np.log1p(self.data['volume'])
+        np.testing.assert_allclose(result['volume'], (log_volume - log_volume.mean()) / log_volume.std(ddof=0))
+
+    def test_partial_fit_matches_fit(self):
+        streamed = FeatureNormalizer()
+        for start in range(0, 100, 30):
+            streamed.partial_fit(self.data.iloc[start:start + 30])
+        full = FeatureNormalizer().fit(self.data)
+        np.testing.assert_allclose(streamed.scaler.mean_, full.scaler.mean_)
+        np.testing.assert_allclose(streamed.scaler.scale_, full.scaler.scale_)
+
+    def test_save_and_load(self):
+        normalizer = FeatureNormalizer().fit(self.data.iloc[:80])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'normalizer.json')
+            normalizer.save(path)
+            loaded = FeatureNormalizer.load(path)
+        pd.testing.assert_frame_equal(loaded.transform(self.data.copy()), normalizer.transform(self.data.copy()))
+
+    def test_rolling_normalize_uses_past_rows_only(self):
+        panel = pd.concat([self.data.assign(symbol='AAPL'), self.data.assign(symbol='MSFT')], ignore_index=True)
+        rolling = rolling_normalize(panel.copy(), ['close'], window=10)
+        expanding = rolling_normalize(panel.copy(), ['close'], window=10, expanding=True)
+        close = self.data['close']
+        np.testing.assert_allclose(rolling['close'].iloc[100 + 15], (close[15] - close[6:16].mean()) / close[6:16].std())
+        np.testing.assert_allclose(expanding['close'].iloc[100 + 15], (close[15] - close[:16].mean()) / close[:16].std())
+        self.assertTrue(rolling['close'].iloc[100:109].isnull().all())
+
+class TestChunkedPrepareData(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        frames = []
+        for symbol in ['AAPL', 'MSFT']:
+            close = 100 + rng.normal(0, 1, 300).cumsum()
+            frames.append(pd.DataFrame({
+                'symbol': symbol,
+                'date': pd.date_range('2020-01-01', periods=300, freq='D'),
+                'close': close,
+                'volume': rng.integers(1000, 5000, 300)
+            }))
+        # Ordered by symbol, then date, like chunks read from the stock table
+        self.data = pd.concat(frames, ignore_index=True)
+
+    def chunks(self, size=70):
+        return (self.data.iloc[start:start + size] for start in range(0, len(self.data), size))
+
+    def expected(self):
+        return pad_missing_values(build_features(self.data.copy()))
+
+    def test_features_match_single_pass(self):
+        result = pd.concat(iter_prepared_data(self.chunks()), ignore_index=True)
+        pd.testing.assert_frame_equal(result, self.expected())
+
+    def test_date_ordered_small_chunks(self):
+        # Chunks shorter than the longest window (50): warm-up rows wait for the chunk that completes them
+        by_date = self.data.sort_values(['date', 'symbol'], kind='stable', ignore_index=True)
+        expected = self.expected().sort_values(['symbol', 'date'], ignore_index=True)
+        for size in [40, 70]:
+            chunks = (by_date.iloc[start:start + size] for start in range(0, len(by_date), size))
+            result = pd.concat(iter_prepared_data(chunks), ignore_index=True)
+            self.assertEqual(result.isna().sum().sum(), 0)
+            result = result.sort_values(['symbol', 'date'], ignore_index=True)
+            pd.testing.assert_frame_equal(result, expected[result.columns])
+
+    def test_single_symbol_small_chunks(self):
+        data = self.data[self.data['symbol'] == 'AAPL'].drop(columns='symbol').reset_index(drop=True)
+        chunks = (data.iloc[start:start + 30] for start in range(0, len(data), 30))
+        result = pd.concat(iter_prepared_data(chunks), ignore_index=True)
+        pd.testing.assert_frame_equal(result, pad_missing_values(build_features(data.copy())))
+
+    def test_normalizer_is_fitted_while_streaming(self):
+        normalizer = FeatureNormalizer()
+        list(iter_prepared_data(self.chunks(), normalizer=normalizer))
+        full = FeatureNormalizer().fit(self.expected())
+        np.testing.assert_allclose(normalizer.scaler.mean_, full.scaler.mean_)
+
+    def test_write_parquet_and_store(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            parquet_path = os.path.join(tmpdir, 'prepared')
+            self.assertEqual(prepare_data_to_file(self.chunks(), parquet_path), len(self.data))
+            loaded = load_stock_data(None, source=parquet_path)
+            np.testing.assert_allclose(loaded['ma_50'], self.expected()['ma_50'])
+
+            store_path = os.path.join(tmpdir, 'store')
+            prepare_data_to_file(self.chunks(), store_path, format='store', feature_columns=['close', 'ma_20'])
+            store = FeatureStore(store_path)
+            self.assertEqual(store.block('MSFT'), (300, 300))
+            np.testing.assert_allclose(store.array('MSFT')[:, 1], self.expected()['ma_20'].iloc[300:], rtol=1e-6)
+
+class TestFillGaps(unittest.TestCase):
+
+    def setUp(self):
+        self.data = pd.DataFrame({
+            'symbol': ['AAPL', 'AAPL', 'AAPL', 'MSFT', 'MSFT'],
+            'date': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-07', '2020-01-02', '2020-01-03']),
+            'close': [1.0, 2.0, 3.0, 10.0, np.nan],
+            'volume': [10, 20, 30, 40, 50]
+        })
+
+    def test_union_calendar(self):
+        result = fill_gaps(self.data)
+        aapl = result[result['symbol'] == 'AAPL']
+        # MSFT traded on the 3rd, so AAPL gets an explicit row; neither symbol is extended past its own range
+        self.assertEqual(list(aapl['date'].dt.day), [1, 2, 3, 7])
+        self.assertEqual(list(aapl['close']), [1.0, 2.0, 2.0, 3.0])
+        self.assertEqual(list(aapl['volume']), [10, 20, 0, 30])
+        self.assertEqual(result['volume'].dtype, np.int64)
+        # Filled per symbol: MSFT's missing close comes from MSFT
+        self.assertEqual(result['close'].iloc[-1], 10.0)
+
+    def test_business_day_calendar_with_limit(self):
+        result = fill_gaps(self.data, calendar='B', limit=1)
+        aapl = result[result['symbol'] == 'AAPL']
+        self.assertEqual(list(aapl['date'].dt.day), [1, 2, 3, 6, 7])
+        np.testing.assert_array_equal(aapl['close'], [1.0, 2.0, 2.0, np.nan, 3.0])
+
+    def test_policy(self):
+        result = fill_gaps(self.data, policy={'close': 'bfill', 'volume': None})
+        aapl = result[result['symbol'] == 'AAPL']
+        self.assertEqual(list(aapl['close']), [1.0, 2.0, 3.0, 3.0])
+        self.assertTrue(pd.isna(aapl['volume'].iloc[2]))
+        self.assertEqual(result['volume'].dtype, 'Int64')
+        with self.assertRaises(ValueError):
+            fill_gaps(self.data, policy={'close': 'mean'})
+
+    def test_ids_survive_unchanged(self):
+        data = self.data.assign(id=make_row_ids(self.data['symbol'], self.data['date']))
+        result = fill_gaps(data)
+        self.assertEqual(result['id'].dtype, 'Int64')
+        self.assertTrue(result['id'].isna().any())
+        kept = result.dropna(subset=['id'])
+        np.testing.assert_array_equal(kept['id'].astype(np.int64), data['id'])
+
+    def test_pad_missing_values_per_symbol(self):
+        data = pd.DataFrame({'symbol': ['AAPL', 'AAPL', 'MSFT', 'MSFT'], 'close': [1.0, 2.0, np.nan, 4.0]})
+        self.assertEqual(list(pad_missing_values(data)['close']), [1.0, 2.0, 4.0, 4.0])
+
+class TestWalkForwardSplits(unittest.TestCase):
+
+    def setUp(self):
+        dates = pd.date_range('2020-01-01', periods=20, freq='D')
+        # Two symbols sorted by date, like prepare_data's output
+        self.data = pd.DataFrame({'date': np.repeat(dates, 2), 'symbol': ['AAPL', 'MSFT'] * 20,
+                                  'close': np.arange(40.0)})
+
+    def test_expanding_folds(self):
+        folds = list(walk_forward_splits(self.data, test_size=4, train_size=8))
+        self.assertEqual(len(folds), n_walk_forward_splits(20, test_size=4, train_size=8))
+        self.assertEqual([(f.train, f.test) for f in folds], [
+            (slice(0, 16), slice(16, 24)), (slice(0, 24), slice(24, 32)), (slice(0, 32), slice(32, 40))])
+        # Slices give views, not copies
+        values = self.data['close'].to_numpy()
+        self.assertTrue(np.shares_memory(values[folds[0].test], values))
+
+    def test_rolling_folds_with_gap(self):
+        folds = list(walk_forward_splits(self.data, test_size=3, train_size=5, step=5, gap=2, expanding=False))
+        for fold in folds:
+            train, test = self.data.iloc[fold.train], self.data.iloc[fold.test]
+            self.assertEqual(train['date'].nunique(), 5)
+            self.assertEqual((test['date'].min() - train['date'].max()).days, 3)
+            # Every symbol is in every window
+            self.assertEqual(set(test['symbol']), {'AAPL', 'MSFT'})
+        self.assertEqual(len(folds), n_walk_forward_splits(20, 3, 5, step=5, gap=2))
+
+    def test_symbol_ordered_rows(self):
+        data = self.data.sort_values(['symbol', 'date'], ignore_index=True)
+        for expected, fold in zip(walk_forward_splits(self.data, 4, 8), walk_forward_splits(data, 4, 8)):
+            pd.testing.assert_frame_equal(data.iloc[fold.test].sort_values(['date', 'symbol'], ignore_index=True),
+                                          self.data.iloc[expected.test].reset_index(drop=True))
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            walk_forward_splits(self.data, test_size=0, train_size=8)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
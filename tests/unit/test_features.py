@@ -1,8 +1,19 @@
 # tests/test_features.py
 
+import os
 import unittest
+import unittest.mock
+import tempfile
+import numpy as np
 import pandas as pd
+import torch
 from src.features.build_features import add_moving_averages, add_rsi, add_bollinger_bands, build_features
+from src.features.build_features import (add_ema, add_macd, add_atr, add_obv, add_vwap, add_stochastic,
+                                         add_zscore, add_log_returns)
+from src.features.online_features import OnlineFeatureEngine
+from src.features.registry import INDICATORS, compute_features, plan_features, register_indicator
+from src.features.feature_cache import FeatureCache
+from src.features.feature_store import FeatureStore, FeatureStoreWriter, write_feature_store
 
 class TestFeatureEngineering(unittest.TestCase):
 
@@ -41,5 +52,279 @@ class TestFeatureEngineering(unittest.TestCase):
         self.assertFalse(result['bb_high'].isnull().all())
         self.assertFalse(result['bb_low'].isnull().all())
 
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = pd.DataFrame({
+            'symbol': ['AAPL'] * 4 + ['MSFT'] * 3,
+            'date': list(pd.date_range('2020-01-01', periods=4)) + list(pd.date_range('2020-01-01', periods=3)),
+            'close': np.arange(7, dtype=float),
+            'rsi': np.arange(7, dtype=float) * 10
+        })
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        store = write_feature_store(self.data, self.tmpdir.name)
+        self.assertEqual(store.columns, ['close', 'rsi'])
+        self.assertEqual(sorted(store.symbols), ['AAPL', 'MSFT'])
+        np.testing.assert_array_equal(store.array('MSFT'), [[4, 40], [5, 50], [6, 60]])
+        np.testing.assert_array_equal(store.array('AAPL', start=1, length=2)[:, 0], [1, 2])
+        self.assertEqual(store.dates('MSFT')[0], np.datetime64('2020-01-01'))
+
+    def test_windows_are_zero_copy(self):
+        store = write_feature_store(self.data, self.tmpdir.name)
+        window = store.array('AAPL', start=1, length=2)
+        self.assertTrue(np.shares_memory(window, store.features))
+
+        tensor = store.tensor('AAPL', start=1, length=2)
+        self.assertEqual(tensor.dtype, torch.float32)
+        self.assertEqual(tensor.data_ptr(), window.ctypes.data)
+
+    def test_chunked_append(self):
+        with FeatureStoreWriter(self.tmpdir.name, ['close', 'rsi']) as writer:
+            writer.write(self.data.iloc[:2], 'AAPL')
+            writer.write(self.data.iloc[2:4], 'AAPL')
+        with FeatureStoreWriter(self.tmpdir.name, ['close', 'rsi'], append=True) as writer:
+            writer.write(self.data.iloc[4:], 'MSFT')
+            with self.assertRaises(ValueError):
+                writer.write(self.data.iloc[:1], 'AAPL')
+
+        store = FeatureStore(self.tmpdir.name)
+        self.assertEqual(store.block('AAPL'), (0, 4))
+        self.assertEqual(store.block('MSFT'), (4, 3))
+
+class TestPanelFeatures(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        frames = []
+        for symbol in ['AAPL', 'MSFT', 'GOOG']:
+            frames.append(pd.DataFrame({
+                'symbol': symbol,
+                'date': pd.date_range('2020-01-01', periods=80),
+                'close': 100 + rng.normal(0, 1, 80).cumsum()
+            }))
+        self.frames = frames
+        self.panel = pd.concat(frames)  # duplicated index labels on purpose
+
+    def test_panel_matches_per_symbol(self):
+        result = build_features(self.panel.copy())
+        for frame in self.frames:
+            expected = build_features(frame.copy())
+            actual = result[result['symbol'] == frame['symbol'].iloc[0]]
+            pd.testing.assert_frame_equal(actual, expected)
+
+    def test_mixed_price_scales(self):
+        # A penny stock after a $500k one, a $2 stock after a $8000 one: no running sum may carry over
+        rng = np.random.default_rng(1)
+        frames = [pd.DataFrame({
+            'symbol': symbol,
+            'date': pd.date_range('2020-01-01', periods=300),
+            'close': level * np.exp(rng.normal(0, 0.02, 300).cumsum())
+        }) for symbol, level in [('BRK', 5e5), ('PENNY', 0.01), ('BIG', 8000.0), ('SMALL', 2.0)]]
+        result = build_features(pd.concat(frames, ignore_index=True))
+        for frame in frames:
+            expected = build_features(frame.copy())
+            actual = result[result['symbol'] == frame['symbol'].iloc[0]]
+            for column in ['ma_20', 'rsi', 'bb_high', 'bb_low']:
+                np.testing.assert_allclose(actual[column], expected[column], rtol=1e-10, err_msg=column)
+            std = (actual['bb_high'] - actual['bb_low']).to_numpy()[50:]
+            self.assertTrue((std > 0).all())
+
+    def test_fused_matches_pandas(self):
+        panel = self.panel.copy()
+        panel.iloc[[3, 100], panel.columns.get_loc('close')] = np.nan
+        expected = build_features(panel.copy())
+        result = build_features(panel.copy(), method='fused')
+        for column in ['ma_5', 'ma_20', 'ma_50', 'rsi', 'bb_high', 'bb_low']:
+            np.testing.assert_allclose(result[column], expected[column], rtol=1e-8, err_msg=column)
+
+    def test_fused_on_large_mixed_scale_panel(self):
+        # 200 symbols x 2500 bars, 2% daily volatility, price levels from 0.01 to 5e5
+        rng = np.random.default_rng(2)
+        levels = np.exp(rng.uniform(np.log(0.01), np.log(5e5), 200))
+        close = levels[:, None] * np.exp(rng.normal(0, 0.02, (200, 2500)).cumsum(axis=1))
+        panel = pd.DataFrame({'symbol': np.repeat(np.arange(200), 2500), 'close': close.ravel()})
+        expected = build_features(panel.copy())
+        result = build_features(panel.copy(), method='fused')
+        for column in ['ma_5', 'ma_50', 'rsi', 'bb_high', 'bb_low']:
+            np.testing.assert_allclose(result[column], expected[column], rtol=1e-8, err_msg=column)
+        std = (result['bb_high'] - result['bb_low']).to_numpy()
+        expected_std = (expected['bb_high'] - expected['bb_low']).to_numpy()
+        np.testing.assert_allclose(std, expected_std, rtol=1e-6)
+
+    def test_interleaved_rows(self):
+        # Sorted by date, so symbols alternate row by row
+        interleaved = self.panel.sort_values(['date', 'symbol'], kind='stable').reset_index(drop=True)
+        result = build_features(interleaved.copy())
+        expected = build_features(self.frames[1].copy())
+        actual = result[result['symbol'] == 'MSFT'].reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual, expected)
+
+class TestOnlineFeatures(unittest.TestCase):
+
+    def test_matches_build_features(self):
+        rng = np.random.default_rng(1)
+        data = pd.DataFrame({
+            'symbol': np.tile(['AAPL', 'MSFT'], 150),
+            'date': np.repeat(pd.date_range('2020-01-01', periods=150), 2),
+            'close': 100 + rng.normal(0, 1, 300).cumsum()
+        })
+        data.loc[10, 'close'] = 100.0
+        data.loc[12, 'close'] = 100.0  # flat stretch: zero gain and loss
+
+        engine = OnlineFeatureEngine()
+        rows = [engine.update(bar) for bar in data.to_dict('records')]
+        result = pd.DataFrame(rows)
+        expected = build_features(data.copy())
+
+        for column in engine.feature_columns:
+            np.testing.assert_allclose(result[column], expected[column], rtol=1e-9, err_msg=column)
+
+    def test_update_many_emits_one_row_per_bar(self):
+        engine = OnlineFeatureEngine(ma_windows=[2], rsi_window=2, bb_window=2)
+        engine.update_many(pd.DataFrame({'symbol': ['A', 'B'], 'close': [1.0, 10.0]}))
+        result = engine.update_many(pd.DataFrame({'symbol': ['A', 'B'], 'close': [3.0, 10.0]}))
+        self.assertEqual(list(result['ma_2']), [2.0, 10.0])
+        self.assertEqual(result['rsi'].iloc[0], 100.0)
+        self.assertTrue(np.isnan(result['rsi'].iloc[1]))
+
+class TestFeatureRegistry(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.data = pd.DataFrame({
+            'symbol': np.repeat(['AAPL', 'MSFT'], 100),
+            'close': 100 + rng.normal(0, 1, 200).cumsum()
+        })
+
+    def test_default_matches_build_features(self):
+        expected = build_features(self.data.copy())
+        result = compute_features(self.data.copy(), n_jobs=4)
+        pd.testing.assert_frame_equal(result[expected.columns], expected)
+
+    def test_subset_only(self):
+        result = compute_features(self.data.copy(), ['ma_7', 'bb_low'])
+        self.assertEqual(sorted(set(result.columns) - set(self.data.columns)), ['bb_high', 'bb_low', 'ma_7'])
+        np.testing.assert_allclose(result['ma_7'], build_features(self.data.copy())['close']
+                                   .groupby(self.data['symbol']).transform(lambda s: s.rolling(7).mean()))
+
+    def test_dependencies_are_planned(self):
+        @register_indicator('rsi_ma', inputs=['rsi'], outputs=['rsi_ma_{window}'], window=3)
+        def rsi_ma(ctx, window):
+            return {f'rsi_ma_{window}': ctx.rolling_mean('rsi', window)}
+
+        try:
+            levels = plan_features(['rsi_ma_5'], self.data.columns)
+            self.assertEqual(levels, [[('rsi', (('window', 14),))], [('rsi_ma', (('window', 5),))]])
+            result = compute_features(self.data.copy(), ['rsi_ma_5'])
+            self.assertIn('rsi', result.columns)
+            self.assertFalse(result['rsi_ma_5'].isnull().all())
+        finally:
+            del INDICATORS['rsi_ma']
+
+    def test_unknown_feature(self):
+        with self.assertRaises(ValueError):
+            compute_features(self.data.copy(), ['nope_3'])
+
+class TestFeatureCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(3)
+        self.data = pd.DataFrame({'close': 100 + rng.normal(0, 1, 300).cumsum()})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hit_matches_build_features(self):
+        cache = FeatureCache(self.tmpdir.name)
+        expected = build_features(self.data.copy())
+        first = cache.build_features(self.data.copy())
+        second = cache.build_features(self.data.copy())
+        pd.testing.assert_frame_equal(first, expected)
+        pd.testing.assert_frame_equal(second, expected)
+        self.assertEqual(len(cache._read_index()), 1)
+
+    def test_appended_rows_recompute_tail(self):
+        cache = FeatureCache(self.tmpdir.name)
+        cache.build_features(self.data.iloc[:250].copy())
+        with unittest.mock.patch('src.features.feature_cache.build_features', wraps=build_features) as build:
+            result = cache.build_features(self.data.copy())
+        self.assertEqual(len(build.call_args[0][0]), 50 + cache.lookback)
+        pd.testing.assert_frame_equal(result, build_features(self.data.copy()), rtol=1e-10)
+
+    def test_changed_input_is_a_miss(self):
+        cache = FeatureCache(self.tmpdir.name)
+        cache.build_features(self.data.copy())
+        changed = self.data.copy()
+        changed.loc[10, 'close'] += 1
+        result = cache.build_features(changed.copy())
+        pd.testing.assert_frame_equal(result, build_features(changed.copy()))
+
+    def test_frame_with_features_stores_full_entry(self):
+        cache = FeatureCache(self.tmpdir.name)
+        expected = build_features(self.data.copy())
+        # Stale feature values must be replaced, and must not leave a featureless entry behind
+        stale = expected.copy()
+        stale[['ma_5', 'rsi']] = 0.0
+        pd.testing.assert_frame_equal(cache.build_features(stale), expected)
+        pd.testing.assert_frame_equal(cache.build_features(self.data.copy()), expected)
+
+    def test_lru_eviction(self):
+        cache = FeatureCache(self.tmpdir.name)
+        cache.build_features(self.data.copy())
+        entry_size = next(iter(cache._read_index().values()))['bytes']
+        cache.max_bytes = int(entry_size * 1.5)
+        cache.build_features(self.data.iloc[::-1].reset_index(drop=True))
+        self.assertEqual(len(cache._read_index()), 1)
+        self.assertEqual(len(os.listdir(self.tmpdir.name)), 2)
+
+class TestIndicators(unittest.TestCase):
+
+    ADD_FUNCTIONS = [add_ema, add_macd, add_atr, add_obv, add_vwap, add_stochastic, add_zscore, add_log_returns]
+
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        frames = []
+        for symbol in ['AAPL', 'MSFT']:
+            close = 100 + rng.normal(0, 1, 80).cumsum()
+            frames.append(pd.DataFrame({'symbol': symbol, 'close': close, 'high': close + 1, 'low': close - 1,
+                                        'volume': rng.integers(100, 1000, 80), 'step': np.arange(80)}))
+        self.frames = frames
+        # Interleaved by date, like a panel read from a database
+        self.panel = pd.concat(frames, ignore_index=True).sort_values('step', kind='stable')
+
+    def test_known_values(self):
+        data = pd.DataFrame({'close': [10.0, 11.0, 10.0, 10.0], 'high': [11.0, 12.0, 11.0, 10.5],
+                             'low': [9.0, 10.0, 9.0, 9.5], 'volume': [100, 200, 300, 400]})
+        np.testing.assert_allclose(add_ema(data.copy(), spans=[3])['ema_3'], [10, 10.5, 10.25, 10.125])
+        np.testing.assert_allclose(add_obv(data.copy())['obv'], [0, 200, -100, -100])
+        np.testing.assert_allclose(add_log_returns(data.copy())['log_return'][1:], np.log([1.1, 10 / 11, 1]))
+        np.testing.assert_allclose(add_atr(data.copy(), window=2)['atr'], [2, 2, 2, 1.5])
+        stochastic = add_stochastic(data.copy(), window=2, smooth=2)
+        np.testing.assert_allclose(stochastic['stoch_k'], [np.nan, 2 / 3 * 100, 1 / 3 * 100, 50])
+        np.testing.assert_allclose(add_vwap(data.copy(), window=2)['vwap'][1:], [
+            (10 * 100 + 11 * 200) / 300, (11 * 200 + 10 * 300) / 500, 10.0])
+
+    def test_panel_matches_per_symbol(self):
+        for add in self.ADD_FUNCTIONS:
+            result = add(self.panel.copy())
+            columns = [c for c in result.columns if c not in self.panel.columns]
+            for frame in self.frames:
+                expected = add(frame.copy())[columns]
+                actual = result[result['symbol'] == frame['symbol'][0]][columns].sort_index()
+                np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-10, err_msg=add.__name__)
+
+    def test_registry(self):
+        result = compute_features(self.panel.copy(), ['macd_hist', 'zscore_10', 'stoch_d'])
+        expected = add_zscore(add_macd(self.panel.copy()), window=10)
+        np.testing.assert_allclose(result['macd_hist'], expected['macd_hist'], rtol=1e-10)
+        np.testing.assert_allclose(result['zscore_10'], expected['zscore_10'], rtol=1e-10)
+        self.assertIn('stoch_k', result.columns)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
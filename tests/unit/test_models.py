@@ -0,0 +1,289 @@
+# tests/test_models.py
+
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+import torch
+from deprecated.mamba import Mamba, MambaConfig
+from deprecated.pscan import pscan, pscan_chunked
+from src.features.feature_store import write_feature_store
+from src.models.dataset import WindowDataset, make_data_loader
+from src.models.predict_model import SlotCachePool, StreamingPredictor
+from src.models.train_model import MambaRegressor, TrainConfig, load_model, train_model
+
+class TestWindowDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.data = pd.DataFrame({
+            'symbol': np.repeat(['AAPL', 'MSFT'], 10),
+            'date': np.tile(pd.date_range('2020-01-01', periods=10), 2),
+            'close': np.arange(20, dtype=np.float64),
+            'rsi': np.arange(20, dtype=np.float64) * 10
+        })
+
+    def test_windows_and_targets(self):
+        dataset = WindowDataset.from_frame(self.data, ['close', 'rsi'], window=4, target_column='close')
+        # 10 rows, window 4, target one row later: 6 samples per symbol
+        self.assertEqual(len(dataset), 12)
+        x, y = dataset[0]
+        self.assertEqual(tuple(x.shape), (4, 2))
+        np.testing.assert_array_equal(x[:, 0], [0, 1, 2, 3])
+        self.assertEqual(y.item(), 4)
+        # Windows never span two symbols
+        x, y = dataset[6]
+        np.testing.assert_array_equal(x[:, 0], [10, 11, 12, 13])
+        self.assertEqual(dataset.locate(6), ('MSFT', 0))
+        x, y = dataset[-1]
+        self.assertEqual(y.item(), 19)
+
+    def test_views_share_memory(self):
+        block = np.arange(30, dtype=np.float32).reshape(10, 3)
+        dataset = WindowDataset([block], window=5, stride=2)
+        self.assertEqual(len(dataset), 3)
+        self.assertTrue(np.shares_memory(dataset.views[0], block))
+        np.testing.assert_array_equal(dataset[2].numpy(), block[4:9])
+
+    def test_data_loader_batches(self):
+        dataset = WindowDataset.from_frame(self.data, ['close', 'rsi'], window=4, target_column='close')
+        loader = make_data_loader(dataset, batch_size=5, shuffle=True, seed=0, num_workers=2)
+        batches = list(loader)
+        self.assertEqual(tuple(batches[0][0].shape), (5, 4, 2))
+        targets = torch.cat([y for _, y in batches])
+        self.assertEqual(sorted(targets.tolist()), list(range(4, 10)) + list(range(14, 20)))
+
+    def test_from_store(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = write_feature_store(self.data, tmpdir, ['close', 'rsi'])
+            dataset = WindowDataset.from_store(store, window=3, target_column='close', horizon=2)
+            self.assertEqual(len(dataset), 12)
+            x, y = dataset[6]
+            np.testing.assert_array_equal(x[:, 1], [100, 110, 120])
+            self.assertEqual(y.item(), 14)
+
+class TestTrainModel(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        blocks = [rng.normal(size=(60, 3)).astype(np.float32) for _ in range(3)]
+        self.dataset = WindowDataset(blocks, window=8, targets=[block[:, 0] for block in blocks])
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def model(self):
+        torch.manual_seed(0)
+        return MambaRegressor(3, hidden=8, layers=1)
+
+    def test_training_reduces_loss_and_checkpoints(self):
+        config = TrainConfig(epochs=4, lr=0.01, batch_size=16, accumulation_steps=2, checkpoint_dir=self.tmpdir.name)
+        model, history = train_model(self.dataset, self.dataset, config, model=self.model())
+        self.assertEqual(len(history), 4)
+        self.assertLess(history[-1]['train_loss'], history[0]['train_loss'])
+        self.assertTrue(all(h['samples_per_sec'] > 0 for h in history))
+
+        loaded = load_model(os.path.join(self.tmpdir.name, 'last.pt'))
+        x = self.dataset[0][0].unsqueeze(0)
+        torch.testing.assert_close(loaded(x), model.eval()(x))
+
+    def test_bf16_and_early_stopping(self):
+        # A zero learning rate never improves the loss: training stops after `patience` stale epochs
+        config = TrainConfig(epochs=10, lr=0.0, batch_size=16, patience=2, min_delta=1e-3, precision='bf16')
+        _, history = train_model(self.dataset, config=config, model=self.model())
+        self.assertEqual(len(history), 3)
+
+    def test_resume(self):
+        config = TrainConfig(epochs=2, batch_size=32, checkpoint_dir=self.tmpdir.name)
+        train_model(self.dataset, config=config, model=self.model())
+        config.epochs = 3
+        _, history = train_model(self.dataset, config=config, model=self.model(), resume=True)
+        self.assertEqual([h['epoch'] for h in history], [0, 1, 2])
+
+    def test_resume_keeps_early_stopping_count(self):
+        # Epoch 1 is already stale when training stops: after resuming, one more stale epoch reaches patience
+        config = TrainConfig(epochs=2, lr=0.0, batch_size=32, patience=2, min_delta=1e-3, checkpoint_dir=self.tmpdir.name)
+        train_model(self.dataset, config=config, model=self.model())
+        checkpoint = torch.load(os.path.join(self.tmpdir.name, 'last.pt'), weights_only=False)
+        self.assertEqual(checkpoint['stale_epochs'], 1)
+        self.assertIn('scaler', checkpoint)
+        config.epochs = 10
+        _, history = train_model(self.dataset, config=config, model=self.model(), resume=True)
+        self.assertEqual(len(history), 3)
+
+class TestStreamingPredictor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'model.pt')
+        torch.manual_seed(0)
+        self.model = MambaRegressor(3, hidden=8, layers=2).eval()
+        torch.save({'model': self.model.state_dict(), 'model_hparams': self.model.hparams}, self.path)
+        rng = np.random.default_rng(0)
+        self.bars = {'AAPL': rng.normal(size=(12, 3)).astype(np.float32),
+                     'MSFT': rng.normal(size=(12, 3)).astype(np.float32)}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def expected(self, symbol, n_bars):
+        with torch.no_grad():
+            return self.model(torch.from_numpy(self.bars[symbol][:n_bars]).unsqueeze(0)).item()
+
+    def test_steps_match_forward(self):
+        predictor = StreamingPredictor(self.path)
+        for t in range(12):
+            predictions = predictor.update_many({symbol: bars[t] for symbol, bars in self.bars.items()})
+            for symbol in self.bars:
+                self.assertAlmostEqual(predictions[symbol], self.expected(symbol, t + 1), places=5)
+        self.assertEqual(predictor.n_steps, {'AAPL': 12, 'MSFT': 12})
+
+    def test_state_resumes_after_restart(self):
+        predictor = StreamingPredictor(self.path)
+        predictor.warm_up('AAPL', self.bars['AAPL'][:7])
+        state_path = os.path.join(self.tmpdir.name, 'state.pt')
+        predictor.save_state(state_path)
+
+        restarted = StreamingPredictor(self.path)
+        restarted.load_state(state_path)
+        self.assertAlmostEqual(restarted.update('AAPL', self.bars['AAPL'][7]), self.expected('AAPL', 8), places=5)
+
+        # Caches of another model are refused
+        torch.manual_seed(1)
+        other = MambaRegressor(3, hidden=8, layers=2)
+        torch.save({'model': other.state_dict(), 'model_hparams': other.hparams}, self.path)
+        with self.assertRaises(ValueError):
+            StreamingPredictor(self.path).load_state(state_path)
+
+class TestSlotCachePool(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = MambaRegressor(3, hidden=8, layers=2).eval()
+        self.bars = {symbol: np.random.default_rng(i).normal(size=(6, 3)).astype(np.float32)
+                     for i, symbol in enumerate(['A', 'B', 'C', 'D'])}
+
+    def expected(self, symbol, first, last):
+        with torch.no_grad():
+            return self.model(torch.from_numpy(self.bars[symbol][first:last]).unsqueeze(0)).item()
+
+    def test_batched_steps_match_forward(self):
+        pool = SlotCachePool(self.model, capacity=4)
+        storage = pool.h.data_ptr(), pool.inputs.data_ptr()
+        # Every bar steps a different subset of symbols: contiguous slots and gathered slots
+        schedule = [['A', 'B', 'C', 'D'], ['C', 'A'], ['A', 'B', 'C', 'D'], ['D', 'B', 'A'], ['B']]
+        seen = {symbol: 0 for symbol in self.bars}
+        for symbols in schedule:
+            features = np.stack([self.bars[symbol][seen[symbol]] for symbol in symbols])
+            predictions = pool.step(symbols, features)
+            for symbol, prediction in zip(symbols, predictions.tolist()):
+                seen[symbol] += 1
+                self.assertAlmostEqual(prediction, self.expected(symbol, 0, seen[symbol]), places=5)
+        self.assertEqual((pool.h.data_ptr(), pool.inputs.data_ptr()), storage)
+
+    def test_slots_are_reused_and_evicted(self):
+        pool = SlotCachePool(self.model, capacity=2)
+        pool.step(['A', 'B'], np.stack([self.bars['A'][0], self.bars['B'][0]]))
+        pool.step(['B'], self.bars['B'][1:2])
+        # A is the least recently stepped: C takes its slot and starts from an empty state
+        prediction = pool.step(['C'], self.bars['C'][:1])
+        self.assertNotIn('A', pool)
+        self.assertEqual(len(pool), 2)
+        self.assertAlmostEqual(prediction.item(), self.expected('C', 0, 1), places=5)
+
+        pool.set_universe(['C', 'D'])
+        self.assertEqual(sorted(pool.slots), ['C', 'D'])
+        self.assertEqual(sorted(pool.slots.values()), [0, 1])
+        with self.assertRaises(ValueError):
+            pool.set_universe(['A', 'B', 'C'])
+
+        # B was stepped less recently than A, but is part of the batch making room for C: A is evicted, not B
+        pool = SlotCachePool(self.model, capacity=2)
+        pool.step(['A', 'B'], np.stack([self.bars['A'][0], self.bars['B'][0]]))
+        pool.step(['A'], self.bars['A'][1:2])
+        pool.step(['B', 'C'], np.stack([self.bars['B'][1], self.bars['C'][0]]))
+        self.assertEqual(sorted(pool.slots), ['B', 'C'])
+        self.assertAlmostEqual(pool.step(['B'], self.bars['B'][2:3]).item(), self.expected('B', 0, 3), places=5)
+        with self.assertRaises(ValueError):
+            pool.step(['D', 'D'], np.stack([self.bars['D'][0]] * 2))
+        self.assertEqual(sorted(pool.slots), ['B', 'C'])
+
+        strict = SlotCachePool(self.model, capacity=1, evict=False)
+        strict.acquire('A')
+        with self.assertRaises(RuntimeError):
+            strict.acquire('B')
+
+class TestScan(unittest.TestCase):
+
+    def scan_inputs(self, L):
+        torch.manual_seed(L)
+        A = torch.rand(2, L, 3, 4, dtype=torch.float64, requires_grad=True)
+        X = torch.randn(2, L, 3, 4, dtype=torch.float64, requires_grad=True)
+        return A, X, torch.randn(2, L, 3, 4, dtype=torch.float64)
+
+    def test_chunked_matches_pscan(self):
+        for L in [1, 5, 16, 37, 130]:
+            for chunk in [1, 4, 32]:
+                A, X, grad = self.scan_inputs(L)
+                expected = pscan(A, X)
+                expected_grads = torch.autograd.grad(expected, (A, X), grad)
+                result = pscan_chunked(A, X, chunk)
+                grads = torch.autograd.grad(result, (A, X), grad)
+                torch.testing.assert_close(result, expected)
+                torch.testing.assert_close(grads, expected_grads)
+
+    def test_chunk_must_be_power_of_two(self):
+        A, X, _ = self.scan_inputs(8)
+        with self.assertRaises(ValueError):
+            pscan_chunked(A, X, 6)
+        with self.assertRaises(ValueError):
+            MambaConfig(d_model=8, n_layers=1, pscan_chunk=6)
+
+    def test_conflicting_scan_options(self):
+        for options in [{'pscan_chunk': 8, 'scan_block': 8}, {'scan_block': 8, 'compiled_scan': 4},
+                        {'pscan_chunk': 8, 'pscan': False}, {'scan_block': 8, 'pscan': False}]:
+            with self.assertRaises(ValueError, msg=str(options)):
+                MambaConfig(d_model=8, n_layers=1, **options)
+        MambaConfig(d_model=8, n_layers=1, compiled_scan=4, pscan=False)
+
+    def test_scan_block_of_any_size(self):
+        x = torch.randn(1, 10, 8)
+        torch.manual_seed(0)
+        model = Mamba(MambaConfig(d_model=8, n_layers=1))
+        expected = model(x)
+        model.layers[0].mixer.config = MambaConfig(d_model=8, n_layers=1, scan_block=3)
+        torch.testing.assert_close(model(x), expected, rtol=1e-4, atol=1e-5)
+
+    def test_mamba_scan_modes_agree(self):
+        x = torch.randn(2, 37, 8)
+        torch.manual_seed(0)
+        model = Mamba(MambaConfig(d_model=8, n_layers=2))
+        expected = model(x)
+        expected_grads = torch.autograd.grad(expected.sum(), list(model.parameters()))
+        for mode in [{'pscan_chunk': 8}, {'scan_block': 8}, {'scan_block': 64}, {'pscan': False}]:
+            for layer in model.layers:
+                layer.mixer.config = MambaConfig(d_model=8, n_layers=2, **mode)
+            result = model(x)
+            grads = torch.autograd.grad(result.sum(), list(model.parameters()))
+            torch.testing.assert_close(result, expected, rtol=1e-4, atol=1e-5, msg=str(mode))
+            torch.testing.assert_close(grads, expected_grads, rtol=1e-4, atol=1e-5, msg=str(mode))
+
+    @unittest.skipUnless(shutil.which('g++') or shutil.which('cl'), "torch.compile needs a C++ compiler on CPU")
+    def test_compiled_scan_matches_pscan(self):
+        x = torch.randn(2, 37, 8)
+        torch.manual_seed(0)
+        model = Mamba(MambaConfig(d_model=8, n_layers=2))
+        expected = model(x)
+        expected_grads = torch.autograd.grad(expected.sum(), list(model.parameters()))
+        for layer in model.layers:
+            layer.mixer.config = MambaConfig(d_model=8, n_layers=2, compiled_scan=2)
+        # 37 steps are not a multiple of 2: the last call is padded
+        result = model(x)
+        grads = torch.autograd.grad(result.sum(), list(model.parameters()))
+        torch.testing.assert_close(result, expected, rtol=1e-4, atol=1e-5)
+        torch.testing.assert_close(grads, expected_grads, rtol=1e-4, atol=1e-5)
+
+if __name__ == '__main__':
+    unittest.main()